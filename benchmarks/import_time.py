@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Check the import time of the owlet CLI against a budget.
+
+Usage: python benchmarks/import_time.py [--budget MS] [--repeat N]
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Modules that must not be imported for the token and devices actions
+DEFERRED = ['dateutil', 'sqlite3', 'gzip', 'concurrent.futures']
+
+
+def import_times(module):
+    """Return cumulative import time in microseconds per module."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module', default='owlet_api.cli')
+    parser.add_argument('--budget', type=float, default=250,
+                        help='Budget in milliseconds')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.repeat):
+        times = import_times(args.module)
+        if best is None or times[args.module] < best[args.module]:
+            best = times
+
+    total = best[args.module] / 1000.0
+    print('%s: %.1f ms (budget %.1f ms)' % (args.module, total, args.budget))
+
+    slowest = sorted(best.items(), key=lambda item: -item[1])[:10]
+    for name, cumulative in slowest:
+        print('  %-40s %8.1f ms' % (name, cumulative / 1000.0))
+
+    failed = False
+    for name in DEFERRED:
+        if name in best:
+            print('%s should not be imported eagerly' % name)
+            failed = True
+
+    if total > args.budget:
+        print('Import time budget exceeded')
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Compare JSON backends decoding large property lists.
+
+Usage: PYTHONPATH=. python benchmarks/json_decode.py [--devices N] [--repeat N]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from owlet_api import owletjson
+from owlet_api.owletproperty import OwletProperty
+
+
+def properties_payload(count):
+    """Build a properties.json response with count properties."""
+    payload = []
+    for index in range(count):
+        payload.append({'property': {
+            'type': 'Property',
+            'name': 'PROPERTY_%d' % (index % 50),
+            'base_type': 'integer',
+            'read_only': False,
+            'direction': 'input',
+            'scope': 'user',
+            'data_updated_at': '2018-12-30T09:43:23Z',
+            'key': 42738116 + index,
+            'device_key': 24826059,
+            'product_name': 'Owlet Baby Monitors',
+            'track_only_changes': True,
+            'display_name': 'Property %d' % (index % 50),
+            'host_sw_version': False,
+            'time_series': False,
+            'derived': False,
+            'app_type': None,
+            'recipe': None,
+            'value': index,
+            'denied_roles': [],
+            'ack_enabled': False,
+            'retention_days': 30,
+        }})
+
+    return json.dumps(payload).encode('utf-8')
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=100,
+                        help='Number of devices (50 properties each)')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = properties_payload(args.devices * 50)
+    print('Payload: %d properties, %d bytes' %
+          (args.devices * 50, len(data)))
+
+    for name in owletjson.BACKENDS:
+        try:
+            owletjson.set_backend(name)
+        except ImportError:
+            print('%-8s not installed' % name)
+            continue
+
+        decode = min(timeit.repeat(lambda: owletjson.loads(data),
+                                   number=1, repeat=args.repeat))
+        parse = min(timeit.repeat(
+            lambda: [OwletProperty(item['property'])
+                     for item in owletjson.loads(data)],
+            number=1, repeat=args.repeat))
+
+        print('%-8s decode %8.2f ms  decode+parse %8.2f ms' %
+              (name, decode * 1000, parse * 1000))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
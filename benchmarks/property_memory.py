@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Measure memory used by the properties of many devices.
+
+Usage: PYTHONPATH=. python benchmarks/property_memory.py [--devices N]
+"""
+
+import argparse
+import sys
+import tracemalloc
+from owlet_api.owletproperty import OwletProperty
+
+
+def property_json(index, device):
+    """Build properties.json entry index of device."""
+    return {
+        'name': 'PROPERTY_%d' % index,
+        'display_name': 'Property %d' % index,
+        'base_type': 'integer',
+        'data_updated_at': '2018-12-30T09:43:23Z',
+        'key': device * 100 + index,
+        'value': index,
+    }
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=1000,
+                        help='Number of devices (50 properties each)')
+    args = parser.parse_args()
+
+    payloads = [[property_json(index, device) for index in range(50)]
+                for device in range(args.devices)]
+
+    tracemalloc.start()
+    devices = [{json['name']: OwletProperty(json) for json in payload}
+               for payload in payloads]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print('%d devices, %d properties: %.1f MiB, %d bytes per property' %
+          (len(devices), 50 * args.devices, size / 2 ** 20,
+           size / (50 * args.devices)))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""Compare transports updating many devices against a local stand-in server.
+
+The stand-in serves sign_in.json, devices.json and the properties of
+--devices devices over plain HTTP/1.1, so it measures the per request
+overhead and connection handling of each transport, not multiplexing
+(which needs an HTTP/2 server such as the Ayla cloud).
+
+Usage: PYTHONPATH=. python benchmarks/transport.py [--devices N]
+       [--threads N] [--repeat N]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import sys
+import threading
+import time
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owlettransport import TRANSPORTS
+
+
+def device_payload(index):
+    """Build the devices.json entry of device index."""
+    return {'device': {
+        'product_name': 'Owlet Baby Monitors',
+        'model': 'AY001MTL1',
+        'dsn': 'AC000W%09d' % index,
+        'sw_version': '1.0',
+        'mac': '00:00:00:00:00:00',
+        'hwsig': '',
+        'lan_ip': '127.0.0.1',
+        'connected_at': '2018-12-30T09:43:23Z',
+        'connection_status': 'Online',
+        'lat': '0.0',
+        'lng': '0.0',
+        'device_type': 'Wifi',
+    }}
+
+
+def properties_payload():
+    """Build a properties response with 50 properties."""
+    return [{'property': {
+        'type': 'Property',
+        'name': 'PROPERTY_%d' % index,
+        'base_type': 'integer',
+        'data_updated_at': '2018-12-30T09:43:23Z',
+        'key': 42738116 + index,
+        'display_name': 'Property %d' % index,
+        'value': index,
+    }} for index in range(50)]
+
+
+def stand_in_server(devices):
+    """Start stand-in server in a thread, return it."""
+    bodies = {
+        '/users/sign_in.json': {'access_token': 'token',
+                                'expires_in': 86400},
+        '/apiv1/devices.json': [device_payload(index)
+                                for index in range(devices)],
+        'properties': properties_payload(),
+    }
+    bodies = {path: json.dumps(body).encode('utf-8')
+              for path, body in bodies.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        """Answer requests of OwletAPI."""
+
+        protocol_version = 'HTTP/1.1'
+
+        def reply(self):
+            """Send the body for the requested path."""
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+
+            path = self.path.split('?')[0]
+            if path.endswith('/properties'):
+                path = 'properties'
+
+            body = bodies.get(path, b'{}')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = reply
+        do_POST = reply
+
+        def log_message(self, *args):
+            """Be quiet."""
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+
+def run(transport, url, threads, repeat):
+    """Update all devices repeat times, return best time in seconds."""
+    api = OwletAPI('bench@example.org', 'secret', transport=transport)
+    api.base_user_url = url + '/users/'
+    api.base_properties_url = url + '/apiv1/'
+    api.login()
+    devices = api.get_devices()
+
+    best = None
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(executor.map(lambda device: device.update(), devices))
+            elapsed = time.perf_counter() - start
+
+            if best is None or elapsed < best:
+                best = elapsed
+
+    return best
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    server = stand_in_server(args.devices)
+    url = 'http://127.0.0.1:%d' % server.server_address[1]
+
+    for transport in TRANSPORTS:
+        try:
+            best = run(transport, url, args.threads, args.repeat)
+        except ImportError:
+            print('%-6s not installed' % transport)
+            continue
+
+        print('%-6s %4d devices %8.2f ms  %8.0f updates/s' %
+              (transport, args.devices, best * 1000, args.devices / best))
+
+    server.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
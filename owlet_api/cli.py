@@ -2,6 +2,7 @@
 """Command Line Interface for OwletAPI."""
 
 import argparse
+import threading
 import time
 import sys
 from owlet_api.owletapi import OwletAPI
@@ -11,7 +12,7 @@ from owlet_api.owletexceptions import OwletPermanentCommunicationException
 
 # By nature, a single command line interface function will trigger some of
 # pylints checks
-# pylint: disable=R0912,R0915,R1702
+# pylint: disable=R0912,R0914,R0915,R1702
 def cli():
     """Command Line Interface for Owletapi."""
     parser = argparse.ArgumentParser(
@@ -20,13 +21,56 @@ def cli():
     parser.add_argument('password', help='Specify Password')
     parser.add_argument('actions', help='Specify the actions', nargs='+',
                         choices=["token", "devices", "attributes",
-                                 "stream", 'download'])
+                                 "stream", 'download', 'export', 'daemon'])
     parser.add_argument('--device', dest='device',
                         help='Specify DSN for device filter')
     parser.add_argument('--stream', dest='attributes', action='append',
                         help='Specify attributes for stream filter')
     parser.add_argument('--timeout', dest='timeout',
                         help='Specify streaming timeout in seconds')
+    parser.add_argument('--store', dest='store',
+                        help='Specify SQLite file to record streamed data')
+    parser.add_argument('--output', dest='output', default='.',
+                        help='Specify directory for exported data')
+    parser.add_argument('--workers', dest='workers', type=int, default=8,
+                        help='Specify number of parallel downloads')
+    parser.add_argument('--deadline', dest='deadline', type=float,
+                        help='Specify time budget in seconds per stream '
+                        'cycle, devices beyond it are skipped')
+    parser.add_argument('--record', dest='record',
+                        help='Specify file to record HTTP exchanges to')
+    parser.add_argument('--replay', dest='replay',
+                        help='Specify recorded file to replay instead of '
+                        'accessing the network')
+    parser.add_argument('--queue-size', dest='queue_size', type=int,
+                        default=1000,
+                        help='Specify number of device updates buffered '
+                        'for slow stream output')
+    parser.add_argument('--overflow', dest='overflow', default='block',
+                        choices=['block', 'drop_oldest', 'coalesce'],
+                        help='Specify what to do when the stream output '
+                        'buffer is full')
+    parser.add_argument('--snapshot', dest='snapshot',
+                        help='Specify file to restore state from at start '
+                        'and save it to while running')
+    parser.add_argument('--transport', dest='transport', default='http1',
+                        choices=['http1', 'http2'],
+                        help='Specify HTTP transport, http2 requires httpx')
+    parser.add_argument('--profile', dest='profile', nargs='?', const='-',
+                        help='Specify file to periodically write stream '
+                        'phase timings to, stderr if no file is given')
+    parser.add_argument('--profile-interval', dest='profile_interval',
+                        type=float, default=60,
+                        help='Specify seconds between profile reports')
+    parser.add_argument('--budget', dest='budget', type=float,
+                        help='Specify property requests per second, '
+                        'important devices are polled first')
+    parser.add_argument('--priority', dest='priority', action='append',
+                        help='Specify DSN to poll with high priority')
+    parser.add_argument('--listen', dest='listen', default='127.0.0.1:8750',
+                        help='Specify host:port or Unix socket path '
+                        '(optionally unix:path) the daemon serves device '
+                        'data at')
     # Parse arguments
     args = parser.parse_args()
 
@@ -35,16 +79,32 @@ def cli():
     else:
         timeout = None
 
+    # pylint: disable=C0415
+    if args.replay:
+        from owlet_api.owletreplay import OwletReplay
+        session = OwletReplay(args.replay)
+    elif args.record:
+        from owlet_api.owletreplay import OwletRecorder
+        from owlet_api.owlettransport import create_session
+        session = OwletRecorder(args.record, create_session(args.transport))
+    else:
+        session = None
+
     # Initialize Owlet api
-    api = OwletAPI()
+    api = OwletAPI(session=session, transport=args.transport)
 
     # Provide Login data
     api.set_email(args.email)
     api.set_password(args.password)
 
-    # Login
+    # Restore token, devices and learned intervals of a previous run
+    restored = args.snapshot is not None and \
+        api.load_snapshot(args.snapshot)
+
+    # Login, with a restored token only once it has expired
     try:
-        api.login()
+        if not restored or api.get_auth_token() is None:
+            api.login()
     except OwletPermanentCommunicationException:
         print("Login failed, username or passwort might be wrong")
         sys.exit(1)
@@ -52,6 +112,14 @@ def cli():
         print("Login failed, server might be down")
         sys.exit(1)
 
+    scheduler = None
+    if args.budget or args.priority:
+        # pylint: disable=C0415
+        from owlet_api.owletscheduler import OwletScheduler
+        scheduler = OwletScheduler(args.budget)
+        for dsn in args.priority or ():
+            scheduler.set_priority(dsn, 'high')
+
     # Print token
     if "token" in args.actions:
         print("Token: %s" % api.get_auth_token())
@@ -80,6 +148,19 @@ def cli():
                 device.update()
                 print(device.download_logged_data())
 
+    if "export" in args.actions:
+        # pylint: disable=C0415
+        from owlet_api.owletexport import OwletExporter
+
+        if args.device is None:
+            dsns = None
+        else:
+            dsns = [args.device]
+
+        exporter = OwletExporter(args.output, max_workers=args.workers)
+        for dsn, status in sorted(exporter.export([api], dsns).items()):
+            print("%15s %s" % (dsn, status))
+
     # Stream Attributes
     if "stream" in args.actions:
         # If no attributes for streaming have been defined, we stream
@@ -91,6 +172,10 @@ def cli():
                     device.update()
                     for name, myproperty in device.get_properties().items():
                         args.attributes.append(name)
+        else:
+            # Only request the attributes we stream, also from devices
+            # added while streaming
+            api.set_property_filter(args.attributes)
 
         # CSV header
         header = "TIMESTAMP;DSN;"
@@ -98,38 +183,192 @@ def cli():
             header = header + attribute + ";"
         print(header)
 
-        # Stream forever
-        while timeout is None or time.time() < timeout:
-            start = time.time()
+        # Output runs in its own thread, so slow consumers of stdout or
+        # the store do not delay polling
+        # pylint: disable=C0415
+        from owlet_api.owletqueue import OwletChangeQueue
+        changes = OwletChangeQueue(args.queue_size, args.overflow)
+        sink = threading.Thread(
+            target=_stream_sink,
+            args=(api, changes, args.attributes, args.store), daemon=True)
+        sink.start()
 
-            for device in api.get_devices():
+        if args.profile:
+            # pylint: disable=C0415
+            from owlet_api.owletprofile import OwletProfiler
+            api.set_profiler(OwletProfiler())
+            next_report = time.time() + args.profile_interval
+
+        next_snapshot = time.time() + 60
+        stopped = False
+        completed = False
+
+        # Stream forever, or until the output fails
+        try:
+            while timeout is None or time.time() < timeout:
+                start = time.time()
+
+                if not sink.is_alive():
+                    break
+
+                if args.snapshot and start >= next_snapshot:
+                    api.save_snapshot(args.snapshot)
+                    next_snapshot = start + 60
+
+                if args.profile and start >= next_report:
+                    _dump_profile(api, args.profile)
+                    next_report = start + args.profile_interval
+
+                if args.deadline:
+                    deadline = start + args.deadline
+                else:
+                    deadline = None
+
+                devices = api.get_active_devices()
+                if scheduler is not None:
+                    devices = scheduler.schedule(devices)
+
+                updated = api.update_all(deadline, devices)
+
+                for device in updated:
+                    if args.device is None or args.device == device.dsn:
+                        changes.put(device.dsn, (time.time(), {
+                            name: (myproperty.timestamp(), myproperty.value)
+                            for name, myproperty
+                            in device.get_properties().items()}))
+
+                # Reactivate all devices with a few batch requests. Devices
+                # that fail are reactivated with the next cycle.
+                api.set_deadline(deadline)
+                api.reactivate_all(updated)
+                api.set_deadline(None)
+
+                wait_time = api.get_update_interval() - (time.time() - start)
                 try:
-                    device.update()
-                except OwletTemporaryCommunicationException:
-                    continue
+                    with api.profile('sleep'):
+                        time.sleep(max(0, wait_time))
+                except (KeyboardInterrupt, SystemExit):
+                    stopped = True
+                    break
+
+            completed = True
+        finally:
+            # Whatever ends the loop, write out what was polled and do not
+            # leave the sink waiting
+            sink_failed = not sink.is_alive()
+            changes.close()
+            sink.join()
 
+            if args.profile:
+                _dump_profile(api, args.profile)
+
+            if args.snapshot and not completed:
+                # Best effort, the error itself is raised anyway
                 try:
-                    device.reactivate()
-                except OwletTemporaryCommunicationException:
-                    continue
+                    api.save_snapshot(args.snapshot)
+                except OSError:
+                    pass
 
-                if args.device is None or args.device == device.dsn:
-                    line = str(time.time()) + ";" + device.dsn + ";"
-                    properties = device.get_properties()
-
-                    for attribute in args.attributes:
-                        if attribute in properties:
-                            line = line + \
-                                str(properties[attribute].value) + ";"
-
-                    print(line)
-                    sys.stdout.flush()
-
-            wait_time = api.get_update_interval() - (time.time() - start)
-            try:
-                time.sleep(max(0, wait_time))
-            except (KeyboardInterrupt, SystemExit):
-                sys.exit(0)
+        if changes.dropped:
+            print("Dropped %d updates of slow output" % changes.dropped,
+                  file=sys.stderr)
+
+        if scheduler is not None and any(scheduler.shed.values()):
+            shed = ", ".join("%s %d" % (priority, count) for priority, count
+                             in scheduler.shed.items() if count)
+            print("Postponed polls over budget: %s" % shed, file=sys.stderr)
+
+        if stopped or sink_failed:
+            if args.snapshot:
+                api.save_snapshot(args.snapshot)
+            sys.exit(1 if sink_failed else 0)
+
+    # Poll in the background for local clients
+    if "daemon" in args.actions:
+        # pylint: disable=C0415
+        from owlet_api.owletdaemon import OwletDaemon
+        daemon = OwletDaemon([api], args.listen, scheduler)
+        daemon.start()
+
+        try:
+            while timeout is None or time.time() < timeout:
+                time.sleep(1)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            daemon.stop()
+
+    if args.snapshot:
+        api.save_snapshot(args.snapshot)
+
+
+def _dump_profile(api, target):
+    """Write profile report to file target, or stderr for '-'."""
+    if target == '-':
+        api.get_profiler().dump(sys.stderr)
+    else:
+        with open(target, 'a', encoding='utf-8') as report_file:
+            api.get_profiler().dump(report_file)
+
+
+def _stream_sink(api, changes, attributes, store_path):
+    """Print (and store) polled properties until changes is closed.
+
+    Returns early if the output fails (e.g. a closed pipe), which the
+    poller notices as the thread is no longer alive.
+    """
+    errors = (OSError,)
+    store = None
+
+    try:
+        if store_path:
+            # pylint: disable=C0415
+            import sqlite3
+            from owlet_api.owletstore import OwletStore
+            errors = (OSError, sqlite3.Error)
+            store = OwletStore(store_path)
+
+        _sink_changes(api, changes, attributes, store)
+
+        if store is not None:
+            store.flush()
+    except errors as error:
+        print("Output failed: %s" % error, file=sys.stderr)
+    finally:
+        # Do not let the poller wait for a sink that is gone
+        changes.close()
+
+        if store is not None:
+            store.close()
+
+
+def _sink_changes(api, changes, attributes, store):
+    """Print and store changes until changes is closed."""
+    while True:
+        change = changes.get()
+        if change is None:
+            break
+
+        dsn, (poll_time, properties) = change
+
+        with api.profile('output'):
+            line = str(poll_time) + ";" + dsn + ";"
+
+            for attribute in attributes:
+                if attribute in properties:
+                    line = line + str(properties[attribute][1]) + ";"
+
+            print(line)
+            sys.stdout.flush()
+
+        if store is not None:
+            for name, (timestamp, value) in properties.items():
+                if timestamp is not None:
+                    store.add_sample(dsn, name, timestamp, value)
+
+            # Write in one transaction what arrived in one go
+            if not changes:
+                store.flush()
 
 
 def init():
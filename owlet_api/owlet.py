@@ -1,20 +1,47 @@
 #!/usr/bin/env python
 """Contains Class Owlet."""
 
+import threading
+import time
 from json.decoder import JSONDecodeError
-import requests
 from requests.exceptions import RequestException
-from .owletproperty import OwletProperty
+from .owletproperty import OwletProperty, MIN_INTERVALS
+from .owletjson import loads
 from .owletexceptions import OwletTemporaryCommunicationException
 from .owletexceptions import OwletNotInitializedException
 
 
+class _Flight():
+    """Result of an update shared by all concurrent callers."""
+
+    # We really only have little public methods
+    # pylint: disable=R0903
+    def __init__(self):
+        """Initialize pending flight."""
+        self.done = threading.Event()
+        self.changes = None
+        self.error = None
+
+
 class Owlet():
     """Class to encapsulate everything related to one Owlet Instance."""
 
     # pylint: disable=R0902
     def __init__(self, api, json):
         """Initialize Owlet with API reference and json object."""
+        self.properties = {}
+        self.update_interval = 10
+        self.owlet_api = api
+        self.freshness = 0
+        self._property_filter = None
+        self._last_fetch = None
+        self._flight = None
+        self._flight_lock = threading.Lock()
+
+        self.update_device_info(json)
+
+    def update_device_info(self, json):
+        """Update device information from json object (devices.json)."""
         self.product_name = json['product_name']
         self.model = json['model']
         self.dsn = json['dsn']
@@ -27,9 +54,58 @@ class Owlet():
         self.lat = float(json['lat'])
         self.lon = float(json['lng'])
         self.device_type = json['device_type']
+
+    def get_device_info(self):
+        """Get device information as JSON object (as in devices.json)."""
+        return {
+            'product_name': self.product_name,
+            'model': self.model,
+            'dsn': self.dsn,
+            'sw_version': self.sw_version,
+            'mac': self.mac,
+            'hwsig': self.hwsig,
+            'lan_ip': self.lan_ip,
+            'connected_at': self.connected_at,
+            'connection_status': self.connection_status,
+            'lat': self.lat,
+            'lng': self.lon,
+            'device_type': self.device_type,
+        }
+
+    def get_state(self):
+        """Get everything known about the Owlet as JSON object."""
+        return {
+            'device': self.get_device_info(),
+            'update_interval': self.update_interval,
+            'properties': [dict(myproperty.to_json(),
+                                intervals=myproperty.get_intervals())
+                           for myproperty in self.properties.values()],
+        }
+
+    def set_state(self, state):
+        """Restore properties and update interval from get_state()."""
         self.properties = {}
-        self.update_interval = 10
-        self.owlet_api = api
+
+        for json in state['properties']:
+            myproperty = OwletProperty(json, self.owlet_api.get_schema())
+            myproperty.set_intervals(json.get('intervals', ()))
+            self.properties[myproperty.name] = myproperty
+
+        self.update_interval = state['update_interval']
+        self._update_health(list(self.properties))
+        self.owlet_api.get_fleet_table().update(self, list(self.properties))
+
+    def is_online(self):
+        """Tell whether the Owlet can send data.
+
+        It cannot when devices.json reports it Offline or its base
+        station is switched off.
+        """
+        if self.connection_status == 'Offline':
+            return False
+
+        base_station = self.properties.get('BASE_STATION_ON')
+        return base_station is None or base_station.value != 0
 
     def get_property(self, myproperty):
         """Get property of the Owlet."""
@@ -52,23 +128,35 @@ class Owlet():
             raise OwletNotInitializedException(
                 'Initialize first - missing property')
 
-        key = self.properties["APP_ACTIVE"].key
+        self.set_datapoint("APP_ACTIVE", 1)
+
+    def set_datapoint(self, name, value):
+        """Write value to property name of the Owlet.
 
-        reactivate_url = self.owlet_api.base_properties_url + \
+        OwletAPI.queue_datapoint() writes to many Owlets in batches.
+        """
+        if name not in self.properties:
+            raise OwletNotInitializedException(
+                'Initialize first - missing property')
+
+        key = self.properties[name].key
+
+        datapoint_url = self.owlet_api.base_properties_url + \
             'properties/{}/datapoints'.format(key)
-        reactivate_headers = self.owlet_api.get_request_headers()
-        reactivate_payload = {
+        datapoint_headers = self.owlet_api.get_request_headers()
+        datapoint_payload = {
             "datapoints": {
-                "value": 1
+                "value": value
             }
         }
 
         try:
-            result = requests.post(
-                reactivate_url,
-                json=reactivate_payload,
-                headers=reactivate_headers,
-                timeout=5
+            result = self.owlet_api.request(
+                'datapoints',
+                'POST',
+                datapoint_url,
+                json=datapoint_payload,
+                headers=datapoint_headers
             )
         except RequestException:
             raise OwletTemporaryCommunicationException(
@@ -78,56 +166,184 @@ class Owlet():
             raise OwletTemporaryCommunicationException(
                 'Server Request failed, return code %s' % result.status_code)
 
+    def set_property_filter(self, names):
+        """Only request and parse properties names (None: all).
+
+        APP_ACTIVE and BASE_STATION_ON are always included, as
+        reactivate() and is_online() need them.
+        """
+        if names is None:
+            self._property_filter = None
+        else:
+            self._property_filter = frozenset(names) | \
+                {"APP_ACTIVE", "BASE_STATION_ON"}
+
+    def get_property_filter(self):
+        """Get names of the properties update() is limited to, or None."""
+        return self._property_filter
+
+    def set_freshness(self, seconds):
+        """Let update() skip the server for seconds after the last one."""
+        self.freshness = seconds
+
     def update(self):
-        """Update attributes of the Owlet."""
+        """Update attributes of the Owlet.
+
+        Returns the names of the properties that are new or changed.
+        Concurrent callers share one request and its result. Within the
+        freshness window after an update, no request is made and nothing
+        has changed.
+        """
+        with self._flight_lock:
+            if self.freshness and self._last_fetch is not None and \
+               time.time() - self._last_fetch < self.freshness:
+                return []
+
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if not leader:
+            flight.done.wait()
+
+            if flight.error is not None:
+                raise flight.error
+
+            return list(flight.changes)
+
+        try:
+            flight.changes = self._fetch()
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._flight_lock:
+                self._flight = None
+                if flight.error is None:
+                    self._last_fetch = time.time()
+
+            flight.done.set()
+
+        return flight.changes
+
+    def _fetch(self):
+        """Request properties from the server and update them."""
         properties_url = self.owlet_api.base_properties_url + \
             'dsns/{}/properties'.format(self.dsn)
 
         properties_header = self.owlet_api.get_request_headers()
 
+        # Let the server leave out everything we are not interested in
+        if self._property_filter is None:
+            properties_params = None
+        else:
+            properties_params = {'names[]': sorted(self._property_filter)}
+
         try:
-            result = requests.get(
+            result = self.owlet_api.request(
+                'properties',
+                'GET',
                 properties_url,
-                headers=properties_header
+                headers=properties_header,
+                params=properties_params
             )
         except RequestException:
+            self.owlet_api.set_device_failing(self.dsn, True)
             raise OwletTemporaryCommunicationException(
                 'Server Request failed - no response')
 
         if result.status_code != 200:
+            self.owlet_api.set_device_failing(self.dsn, True)
             raise OwletTemporaryCommunicationException(
                 'Server Request failed - status code')
 
+        self.owlet_api.set_device_failing(self.dsn, False)
+
         try:
-            json = result.json()
+            with self.owlet_api.profile('json'):
+                json = loads(result.content)
         except JSONDecodeError:
             raise OwletTemporaryCommunicationException(
                 'Update failed - JSON error')
 
+        with self.owlet_api.profile('parse'):
+            changes = self._update_properties(json)
+
+        self._update_health(changes)
+        self.owlet_api.get_fleet_table().update(self, changes)
+
+        self._update_interval()
+
+        return changes
+
+    def _update_properties(self, json):
+        """Update properties from JSON, return names of changed ones."""
+        changes = []
+        property_filter = self._property_filter
+
         for myproperty in json:
             property_name = myproperty['property']['name']
+            if property_filter is not None and \
+               property_name not in property_filter:
+                continue
+
             if property_name in self.properties:
-                self.properties[property_name].update(myproperty['property'])
+                if self.properties[property_name].update(
+                        myproperty['property']):
+                    changes.append(property_name)
             else:
-                new_property = OwletProperty(myproperty['property'])
+                new_property = OwletProperty(myproperty['property'],
+                                             self.owlet_api.get_schema())
                 self.properties[new_property.name] = new_property
+                changes.append(new_property.name)
 
-        for name, myproperty in self.properties.items():
-            if name == "APP_ACTIVE":
-                continue
+        return changes
+
+    def _update_interval(self):
+        """Follow the fastest estimated update interval of the properties.
+
+        Once a property changed at least MIN_INTERVALS times, properties
+        that changed less often (e.g. a single burst) no longer count.
+        """
+        # APP_ACTIVE is written by us, not by the Owlet
+        estimates = [(len(myproperty.get_intervals()) >= MIN_INTERVALS,
+                      myproperty.update_interval)
+                     for name, myproperty in self.properties.items()
+                     if name != "APP_ACTIVE" and
+                     myproperty.update_interval is not None]
 
-            if self.update_interval is None or \
-               (myproperty.minimum_update_interval is not None and
-                myproperty.minimum_update_interval > 0 and
-                myproperty.minimum_update_interval < self.update_interval):
-                self.update_interval = myproperty.minimum_update_interval
+        intervals = [interval for trusted, interval in estimates if trusted]
+        if not intervals:
+            intervals = [interval for _, interval in estimates]
+
+        if intervals:
+            self.update_interval = min(intervals)
+
+    def _update_health(self, changes):
+        """Record the newest data timestamp in the API's health index."""
+        last_data = None
+
+        # APP_ACTIVE is written by us, it does not tell the Owlet is alive
+        for name in changes:
+            last_update = self.properties[name].last_update
+            if name != "APP_ACTIVE" and last_update is not None and \
+               (last_data is None or last_update > last_data):
+                last_data = last_update
+
+        if last_data is not None:
+            self.owlet_api.get_health_index().touch(
+                self.dsn, last_data.timestamp())
 
     def get_update_interval(self):
         """Get interval in seconds when new data is available."""
         return self.update_interval
 
-    def download_logged_data(self):
-        """Download "LOGGED_DATA_CACHE", content currently unknown."""
+    def download_logged_data(self, raw=False):
+        """Download "LOGGED_DATA_CACHE", content currently unknown.
+
+        The payload is returned as text, or as bytes if raw is set.
+        """
         if not self.properties:
             raise OwletNotInitializedException(
                 'Initialize first - no properties')
@@ -140,10 +356,11 @@ class Owlet():
         download_header = self.owlet_api.get_request_headers()
 
         try:
-            result = requests.get(
+            result = self.owlet_api.request(
+                'logged_data',
+                'GET',
                 download_url,
-                headers=download_header,
-                timeout=5
+                headers=download_header
             )
         except RequestException:
             raise OwletTemporaryCommunicationException(
@@ -154,7 +371,7 @@ class Owlet():
                 'Server Request failed - return code')
 
         try:
-            json = result.json()
+            json = loads(result.content)
         except JSONDecodeError:
             raise OwletTemporaryCommunicationException(
                 'Request failed - JSON invalid')
@@ -167,7 +384,9 @@ class Owlet():
         download_file_url = json['datapoint']['file']
 
         try:
-            result = requests.get(
+            result = self.owlet_api.request(
+                'file',
+                'GET',
                 download_file_url
             )
         except RequestException:
@@ -178,4 +397,7 @@ class Owlet():
             raise OwletTemporaryCommunicationException(
                 'Download Request failed - status code')
 
+        if raw:
+            return result.content
+
         return result.text
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""Evaluate alert rules on property changes of Owlets."""
+
+from collections import namedtuple
+import operator
+import time
+
+
+def _outside(value, limits):
+    """Test whether value is outside of the (low, high) range."""
+    return value < limits[0] or value > limits[1]
+
+
+def _inside(value, limits):
+    """Test whether value is within the (low, high) range."""
+    return limits[0] <= value <= limits[1]
+
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'outside': _outside,
+    'inside': _inside,
+}
+
+# Alert raised or cleared by a rule for one device
+OwletAlert = namedtuple(
+    'OwletAlert', ['rule', 'dsn', 'property', 'state', 'value', 'timestamp'])
+
+
+class OwletRule():
+    """Rule raising an alert while a property meets a condition.
+
+    The condition is "value op threshold", e.g. OwletRule('low oxygen',
+    'OXYGEN_LEVEL', '<', 90). For 'outside' and 'inside' the threshold
+    is a (low, high) tuple. The alert is raised once the condition held
+    for duration seconds (debounce). It is cleared when the condition
+    with the clear threshold no longer holds (hysteresis), e.g. clear=92
+    keeps the low oxygen alert up until the level is back at 92.
+    """
+
+    # We really only have little public methods
+    # pylint: disable=R0903,R0913
+    def __init__(self, name, property_name, op, threshold, *,
+                 duration=0, clear=None):
+        """Initialize and compile rule."""
+        if op not in OPERATORS:
+            raise ValueError('Unknown operator %s' % op)
+
+        if clear is None:
+            clear = threshold
+
+        self.name = name
+        self.property = property_name
+        self.op = op
+        self.threshold = threshold
+        self.duration = duration
+        self.clear = clear
+        self._test = OPERATORS[op]
+
+    def test(self, value, active=False):
+        """Test value against the raise (or, if active, clear) threshold."""
+        try:
+            return bool(self._test(value,
+                                   self.clear if active else self.threshold))
+        except TypeError:
+            return False
+
+
+class OwletAlertEngine():
+    """Evaluate rules on property changes of many devices.
+
+    Rules are indexed by property, so a change only evaluates the rules
+    of its property, independent of the number of rules and devices.
+    """
+
+    def __init__(self, rules=()):
+        """Initialize engine with rules."""
+        self._rules = {}
+        self._by_property = {}
+        # (rule name, dsn) -> [property, value, time the condition holds
+        # since, active]
+        self._state = {}
+        self._pending = set()
+
+        for rule in rules:
+            self.add_rule(rule)
+
+    def add_rule(self, rule):
+        """Add rule, replacing a rule of the same name."""
+        if rule.name in self._rules:
+            self.remove_rule(rule.name)
+
+        self._rules[rule.name] = rule
+        self._by_property.setdefault(rule.property, []).append(rule)
+
+    def remove_rule(self, name):
+        """Remove rule name and its alerts."""
+        rule = self._rules.pop(name)
+        self._by_property[rule.property].remove(rule)
+
+        for key in [key for key in self._state if key[0] == name]:
+            del self._state[key]
+            self._pending.discard(key)
+
+    def process(self, dsn, name, value, timestamp=None):
+        """Evaluate rules for a new value of property name of dsn.
+
+        Returns list of OwletAlert that were raised or cleared.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        events = []
+
+        for rule in self._by_property.get(name, ()):
+            key = (rule.name, dsn)
+            state = self._state.get(key)
+            active = state is not None and state[3]
+
+            if rule.test(value, active):
+                if state is None:
+                    state = self._state[key] = [name, value, timestamp,
+                                                False]
+                    self._pending.add(key)
+                state[1] = value
+
+                if not active and timestamp - state[2] >= rule.duration:
+                    state[3] = True
+                    self._pending.discard(key)
+                    events.append(OwletAlert(rule.name, dsn, name, 'raised',
+                                             value, timestamp))
+            elif state is not None:
+                del self._state[key]
+                self._pending.discard(key)
+
+                if active:
+                    events.append(OwletAlert(rule.name, dsn, name,
+                                             'cleared', value, timestamp))
+
+        return events
+
+    def process_update(self, device, changes):
+        """Evaluate rules for the changes returned by device.update()."""
+        events = []
+
+        for name in changes:
+            if name not in self._by_property:
+                continue
+
+            myproperty = device.get_property(name)
+            events.extend(self.process(device.dsn, name, myproperty.value,
+                                       myproperty.timestamp()))
+
+        return events
+
+    def tick(self, now=None):
+        """Raise debounced alerts whose duration passed without changes."""
+        if now is None:
+            now = time.time()
+
+        events = []
+
+        for key in list(self._pending):
+            name, value, since, _ = self._state[key]
+
+            if now - since >= self._rules[key[0]].duration:
+                self._state[key][3] = True
+                self._pending.discard(key)
+                events.append(OwletAlert(key[0], key[1], name, 'raised',
+                                         value, now))
+
+        return events
+
+    def get_active(self, dsn=None):
+        """Get (rule name, dsn) of all active alerts, of dsn if given."""
+        return sorted(key for key, state in self._state.items()
+                      if state[3] and (dsn is None or key[1] == dsn))
@@ -1,11 +1,19 @@
 #!/usr/bin/env python
 """Handles Owlet API stuff."""
 
+import json
 from json.decoder import JSONDecodeError
+import os
 import time
-import requests
-from requests.exceptions import RequestException
+from requests.exceptions import RequestException, Timeout
 from .owlet import Owlet
+from .owletfleet import OwletFleetTable
+from .owlethealth import OwletHealthIndex
+from .owletschema import OwletSchema
+from .owletprofile import NULL_PHASE
+from .owlettransport import create_session, accept_encoding, transfer_size
+from .owletjson import loads
+from .owletexceptions import OwletException
 from .owletexceptions import OwletTemporaryCommunicationException
 from .owletexceptions import OwletPermanentCommunicationException
 from .owletexceptions import OwletNotInitializedException
@@ -14,16 +22,73 @@ from .owletexceptions import OwletNotInitializedException
 class OwletAPI():
     """Handles Owlet API stuff."""
 
+    # pylint: disable=R0902,R0904
+
     base_user_url = 'https://user-field.aylanetworks.com/users/'
     base_properties_url = 'https://ads-field.aylanetworks.com/apiv1/'
 
-    def __init__(self, email=None, password=None):
-        """Initialize OwletAPI, with email and password as opt. arguments."""
+    # (connect, read) timeouts in seconds per endpoint
+    default_timeouts = {
+        'login': (5, 5),
+        'devices': (5, 5),
+        'properties': (5, 5),
+        'datapoints': (5, 5),
+        'batch_datapoints': (5, 10),
+        'logged_data': (5, 5),
+        'file': (5, 60),
+    }
+
+    # Seconds after which get_active_devices() re-reads devices.json
+    devices_refresh_interval = 300
+
+    # Datapoints written per batch_datapoints request
+    datapoint_batch_size = 100
+
+    # Version of the snapshot format written by save_snapshot()
+    snapshot_version = 1
+
+    # Offline or failing devices are probed after (initially, at most)
+    # seconds, the delay doubling with every probe
+    offline_backoff = (10, 600)
+
+    def __init__(self, email=None, password=None, session=None,
+                 transport='http1'):
+        """Initialize OwletAPI, with email and password as opt. arguments.
+
+        All HTTP requests go through session, by default a new session of
+        transport 'http1' (requests) or 'http2' (httpx, see
+        owlettransport). See owletreplay for recording and replaying
+        sessions.
+        """
         self._email = email
         self._password = password
         self._auth_token = None
         self._expiry_time = None
         self._devices = []
+        self._devices_by_dsn = {}
+        self._devices_updated_at = None
+        self._property_filter = None
+        self._failing = set()
+        self._backoff = {}
+        self._datapoints = []
+        self._batch_datapoints = True
+        self._health = OwletHealthIndex()
+        self._schema = OwletSchema()
+        self._fleet = OwletFleetTable()
+        self._timeouts = dict(self.default_timeouts)
+        self._deadline = None
+        self._profiler = None
+        self._transfer = {}
+        self._metrics = {
+            'timeouts': 0,
+            'deadline_overruns': 0,
+            'deadline_skipped_devices': 0,
+        }
+
+        if session is None:
+            session = create_session(transport)
+
+        self._session = session
 
     def set_email(self, email):
         """Set Emailadress aka Username."""
@@ -33,6 +98,88 @@ class OwletAPI():
         """Set Password."""
         self._password = password
 
+    def set_timeout(self, endpoint, connect, read=None):
+        """Set connect and read timeout in seconds for endpoint."""
+        if read is None:
+            read = connect
+
+        self._timeouts[endpoint] = (connect, read)
+
+    def get_timeout(self, endpoint):
+        """Get (connect, read) timeout for endpoint, within the deadline."""
+        connect, read = self._timeouts[endpoint]
+
+        if self._deadline is not None:
+            remaining = self._deadline - time.time()
+
+            if remaining <= 0:
+                self._metrics['deadline_overruns'] += 1
+                raise OwletTemporaryCommunicationException(
+                    'Deadline exceeded')
+
+            connect = min(connect, remaining)
+            read = min(read, remaining)
+
+        return (connect, read)
+
+    def set_deadline(self, deadline):
+        """Set time (as time.time()) by which all requests must be done.
+
+        Requests get their timeouts cut to the remaining time, requests
+        after the deadline fail. None removes the deadline.
+        """
+        self._deadline = deadline
+
+    def get_metrics(self):
+        """Get counters of timeouts and deadline overruns."""
+        return dict(self._metrics)
+
+    def set_profiler(self, profiler):
+        """Time the phases of all requests with profiler (None: off)."""
+        self._profiler = profiler
+
+    def get_profiler(self):
+        """Get profiler, if profiling is on."""
+        return self._profiler
+
+    def profile(self, phase):
+        """Get context manager timing phase, if profiling is on."""
+        if self._profiler is None:
+            return NULL_PHASE
+
+        return self._profiler.phase(phase)
+
+    def get_transfer_stats(self):
+        """Get requests and compressed/uncompressed bytes per endpoint."""
+        return {endpoint: {'requests': stats[0],
+                           'compressed_bytes': stats[1],
+                           'uncompressed_bytes': stats[2]}
+                for endpoint, stats in self._transfer.items()}
+
+    def request(self, endpoint, method, url, **kwargs):
+        """Perform HTTP request to endpoint, arguments as for requests.
+
+        Compressed responses are asked for and decompressed while they
+        are read, their size before and after is counted per endpoint.
+        """
+        kwargs['timeout'] = self.get_timeout(endpoint)
+        kwargs['headers'] = dict(kwargs.get('headers') or {})
+        kwargs['headers'].setdefault('Accept-Encoding', accept_encoding())
+
+        try:
+            with self.profile('http'):
+                result = self._session.request(method, url, **kwargs)
+        except Timeout:
+            self._metrics['timeouts'] += 1
+            raise
+
+        stats = self._transfer.setdefault(endpoint, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += transfer_size(result)
+        stats[2] += len(result.content)
+
+        return result
+
     def login(self):
         """Login to Owlet Cloud Service and obtain Auth Token."""
         login_headers = {
@@ -54,11 +201,12 @@ class OwletAPI():
         }
 
         try:
-            result = requests.post(
+            result = self.request(
+                'login',
+                'POST',
                 login_url,
                 json=login_payload,
-                headers=login_headers,
-                timeout=5
+                headers=login_headers
             )
         except RequestException:
             raise OwletTemporaryCommunicationException(
@@ -74,7 +222,7 @@ class OwletAPI():
 
         # Login seems to be ok, extract json
         try:
-            json_result = result.json()
+            json_result = loads(result.content)
         except JSONDecodeError:
             raise OwletTemporaryCommunicationException(
                 'Server did not send valid json')
@@ -123,10 +271,11 @@ class OwletAPI():
         devices_headers = self.get_request_headers()
 
         try:
-            result = requests.get(
+            result = self.request(
+                'devices',
+                'GET',
                 devices_url,
-                headers=devices_headers,
-                timeout=5
+                headers=devices_headers
             )
         except RequestException:
             raise OwletTemporaryCommunicationException(
@@ -137,16 +286,40 @@ class OwletAPI():
                 'Server request failed - status code')
 
         try:
-            json_result = result.json()
+            with self.profile('json'):
+                json_result = loads(result.content)
         except JSONDecodeError:
             raise OwletTemporaryCommunicationException(
                 'Server did not send valid json')
 
+        # Keep the Owlets (and what they learned) of known devices
+        known_devices = self._devices_by_dsn
         self._devices = []
+        self._devices_by_dsn = {}
 
         for device in json_result:
-            new_device = Owlet(self, device['device'])
+            dsn = device['device']['dsn']
+
+            if dsn in known_devices:
+                new_device = known_devices[dsn]
+                new_device.update_device_info(device['device'])
+            else:
+                new_device = Owlet(self, device['device'])
+                new_device.set_property_filter(self._property_filter)
+
             self._devices.append(new_device)
+            self._devices_by_dsn[dsn] = new_device
+            self._health.set_status(
+                dsn, device['device']['connection_status'])
+
+        for dsn in known_devices:
+            if dsn not in self._devices_by_dsn:
+                self._health.remove(dsn)
+                self._fleet.remove(dsn)
+                self._failing.discard(dsn)
+                self._backoff.pop(dsn, None)
+
+        self._devices_updated_at = time.time()
 
         return self._devices
 
@@ -157,6 +330,290 @@ class OwletAPI():
 
         return self._devices
 
+    def set_property_filter(self, names):
+        """Limit update() of all devices to properties names (None: all).
+
+        Applies to devices found later by update_devices() as well, see
+        Owlet.set_property_filter().
+        """
+        self._property_filter = names
+
+        for device in self._devices:
+            device.set_property_filter(names)
+
+    def set_device_failing(self, dsn, failing):
+        """Record whether requests for device dsn fail."""
+        if failing:
+            self._failing.add(dsn)
+        else:
+            self._failing.discard(dsn)
+
+    def get_active_devices(self, now=None):
+        """Get devices worth polling now.
+
+        Online devices are always returned. Offline devices (see
+        Owlet.is_online) and devices whose requests fail are only returned
+        to probe them, at growing intervals (offline_backoff). devices.json
+        is re-read every devices_refresh_interval seconds to learn about
+        connection changes.
+        """
+        if now is None:
+            now = time.time()
+
+        if self._devices_updated_at is None or \
+           now - self._devices_updated_at >= self.devices_refresh_interval:
+            try:
+                self.update_devices()
+            except OwletTemporaryCommunicationException:
+                if not self._devices:
+                    raise
+
+        active = []
+
+        for device in self._devices:
+            if device.is_online() and device.dsn not in self._failing:
+                self._backoff.pop(device.dsn, None)
+                active.append(device)
+                continue
+
+            backoff = self._backoff.get(device.dsn)
+            if backoff is None:
+                self._backoff[device.dsn] = [self.offline_backoff[0],
+                                             now + self.offline_backoff[0]]
+            elif now >= backoff[1]:
+                active.append(device)
+                backoff[0] = min(2 * backoff[0], self.offline_backoff[1])
+                backoff[1] = now + backoff[0]
+
+        return active
+
+    def queue_datapoint(self, device, name, value):
+        """Queue write of value to property name of device.
+
+        Queued datapoints are written by flush_datapoints().
+        """
+        self._datapoints.append((device, name, value))
+
+    def flush_datapoints(self):
+        """Write all queued datapoints, in batches if the server can.
+
+        Returns list of (dsn, name, success) in the order queued.
+        """
+        datapoints = self._datapoints
+        self._datapoints = []
+        results = []
+
+        for start in range(0, len(datapoints), self.datapoint_batch_size):
+            batch = datapoints[start:start + self.datapoint_batch_size]
+            written = None
+
+            if self._batch_datapoints:
+                written = self._write_batch(batch)
+
+            if written is None:
+                written = [self._write_datapoint(*datapoint)
+                           for datapoint in batch]
+
+            results.extend((device.dsn, name, success)
+                           for (device, name, _), success
+                           in zip(batch, written))
+
+        return results
+
+    def reactivate_all(self, devices=None):
+        """Reactivate streaming of devices (default: all) in batches.
+
+        Returns list of (dsn, 'APP_ACTIVE', success).
+        """
+        if devices is None:
+            devices = self.get_devices()
+
+        for device in devices:
+            self.queue_datapoint(device, 'APP_ACTIVE', 1)
+
+        return self.flush_datapoints()
+
+    def _write_batch(self, batch):
+        """Write batch of datapoints with one request.
+
+        Returns list of successes, or None to write them one by one
+        because the account or cloud has no batch endpoint.
+        """
+        batch_url = self.base_properties_url + 'batch_datapoints.json'
+        batch_payload = {
+            'batch_datapoints': [{
+                'dsn': device.dsn,
+                'name': name,
+                'datapoint': {
+                    'value': value
+                }
+            } for device, name, value in batch]
+        }
+
+        try:
+            result = self.request(
+                'batch_datapoints',
+                'POST',
+                batch_url,
+                json=batch_payload,
+                headers=self.get_request_headers()
+            )
+        except (RequestException, OwletTemporaryCommunicationException):
+            # Writing one by one would only fail many times over
+            return [False] * len(batch)
+
+        # Not available for this account or cloud
+        if result.status_code in (404, 405):
+            self._batch_datapoints = False
+            return None
+
+        if result.status_code not in (200, 201, 207):
+            return [False] * len(batch)
+
+        # Per item results, if the server sends them
+        try:
+            items = loads(result.content)
+        except JSONDecodeError:
+            items = None
+
+        if not isinstance(items, list) or len(items) != len(batch):
+            return [True] * len(batch)
+
+        return [isinstance(item, dict) and
+                item.get('status', 201) in (200, 201)
+                for item in items]
+
+    @staticmethod
+    def _write_datapoint(device, name, value):
+        """Write one datapoint, return whether that succeeded."""
+        try:
+            device.set_datapoint(name, value)
+        except OwletException:
+            return False
+
+        return True
+
+    def save_snapshot(self, path):
+        """Save token, devices and everything learned about them to path.
+
+        The file is replaced atomically and only readable by the owner,
+        as it contains the auth token.
+        """
+        snapshot = {
+            'version': self.snapshot_version,
+            'email': self._email,
+            'auth_token': self._auth_token,
+            'expiry_time': self._expiry_time,
+            'devices_updated_at': self._devices_updated_at,
+            'failing': sorted(self._failing),
+            'backoff': self._backoff,
+            'devices': [device.get_state() for device in self._devices],
+        }
+
+        temporary_path = '%s.%d.tmp' % (path, os.getpid())
+        descriptor = os.open(temporary_path,
+                             os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file, separators=(',', ':'))
+
+        os.replace(temporary_path, path)
+
+    def load_snapshot(self, path):
+        """Restore state saved by save_snapshot() from path.
+
+        Returns False (and changes nothing) if there is no usable
+        snapshot of this account.
+        """
+        try:
+            with open(path, 'rb') as snapshot_file:
+                snapshot = loads(snapshot_file.read())
+        except (OSError, JSONDecodeError):
+            return False
+
+        if not isinstance(snapshot, dict) or \
+           snapshot.get('version') != self.snapshot_version or \
+           (self._email is not None and
+            snapshot.get('email') != self._email):
+            return False
+
+        # Devices restore into the health index and fleet table of the
+        # API, so those are only kept if the whole snapshot is usable
+        previous_indexes = self._health, self._fleet
+        self._health = OwletHealthIndex()
+        self._fleet = OwletFleetTable()
+
+        try:
+            email = snapshot['email']
+            auth_token = snapshot['auth_token']
+            expiry_time = snapshot['expiry_time']
+            devices_updated_at = snapshot['devices_updated_at']
+            failing = set(snapshot['failing'])
+            backoff = {dsn: [delay, next_probe] for dsn, (delay, next_probe)
+                       in snapshot['backoff'].items()}
+            devices = []
+
+            for state in snapshot['devices']:
+                device = Owlet(self, state['device'])
+                device.set_property_filter(self._property_filter)
+                self._health.set_status(device.dsn, device.connection_status)
+                device.set_state(state)
+                devices.append(device)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self._health, self._fleet = previous_indexes
+            return False
+
+        self._email = email
+        self._auth_token = auth_token
+        self._expiry_time = expiry_time
+        self._devices = devices
+        self._devices_by_dsn = {device.dsn: device for device in devices}
+        self._devices_updated_at = devices_updated_at
+        self._failing = failing
+        self._backoff = backoff
+
+        return True
+
+    def update_all(self, deadline=None, devices=None):
+        """Update devices (default: all), return those updated successfully.
+
+        With a deadline, devices that would overrun it are skipped.
+        """
+        updated = []
+        self.set_deadline(deadline)
+
+        if devices is None:
+            devices = self.get_devices()
+
+        try:
+            for device in devices:
+                if deadline is not None and time.time() >= deadline:
+                    self._metrics['deadline_skipped_devices'] += 1
+                    continue
+
+                try:
+                    device.update()
+                except OwletTemporaryCommunicationException:
+                    continue
+
+                updated.append(device)
+        finally:
+            self.set_deadline(None)
+
+        return updated
+
+    def get_fleet_table(self):
+        """Get table of the current values of all devices."""
+        return self._fleet
+
+    def get_schema(self):
+        """Get registry of the property definitions of all devices."""
+        return self._schema
+
+    def get_health_index(self):
+        """Get index of last data and connection status of all devices."""
+        return self._health
+
     def get_update_interval(self):
         """Get interval in seconds when new data is available."""
         update_interval = None
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""Poll in the background and serve the latest data to local clients."""
+
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import os
+import socketserver
+import stat
+import threading
+import time
+import traceback
+from urllib.parse import parse_qs, urlsplit
+from .owletexceptions import OwletException
+
+# Longest wait of /changes in seconds
+MAX_WAIT = 60
+
+
+class OwletChangeLog():
+    """Numbered log of the latest property changes, for long-polling.
+
+    Every change gets the next sequence number. Clients ask for the
+    changes after the last sequence number they have seen and wait if
+    there are none yet.
+    """
+
+    def __init__(self, maxlen=10000):
+        """Initialize empty log keeping the last maxlen changes."""
+        self._changes = deque(maxlen=maxlen)
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def append(self, dsn, name, timestamp, value):
+        """Log change of property name of dsn, wake up waiting clients."""
+        with self._condition:
+            self._sequence += 1
+            self._changes.append({'seq': self._sequence, 'dsn': dsn,
+                                  'name': name, 'timestamp': timestamp,
+                                  'value': value})
+            self._condition.notify_all()
+
+    def since(self, sequence, timeout=0):
+        """Get (last sequence number, changes after sequence).
+
+        Waits up to timeout seconds for changes if there are none. A
+        sequence from before a restart (larger than the last one) gets
+        all changes kept.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._sequence != sequence, timeout)
+
+            if sequence > self._sequence:
+                sequence = 0
+
+            return self._sequence, [change for change in self._changes
+                                    if change['seq'] > sequence]
+
+
+def device_json(device):
+    """Get device information and properties of device as JSON object."""
+    return dict(device.get_device_info(),
+                update_interval=device.get_update_interval(),
+                properties={name: myproperty.to_json() for name, myproperty
+                            in device.get_properties().items()})
+
+
+class OwletDaemon():
+    """Poll the devices of several accounts and serve them over HTTP.
+
+    One thread per account (OwletAPI) polls its active devices and
+    reactivates them. The latest data of all devices and a log of
+    changes are served at listen, "host:port" or the path of a Unix
+    socket (optionally "unix:<path>"):
+    GET /devices: all devices with their properties
+    GET /devices/<dsn>: one device
+    GET /changes?since=<seq>&timeout=<seconds>: changes after seq,
+    waiting up to timeout seconds for them
+    """
+
+    # pylint: disable=R0902
+    def __init__(self, apis, listen='127.0.0.1:8750', scheduler=None):
+        """Initialize daemon for apis (logged in), see start()."""
+        self.apis = list(apis)
+        self.listen = listen
+        self.scheduler = scheduler
+        self.changes = OwletChangeLog()
+        # Device JSON objects by DSN, per API
+        self._devices = {api: {} for api in self.apis}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._server = None
+
+    def get_devices(self):
+        """Get {dsn: device JSON object} of all devices."""
+        devices = {}
+
+        with self._lock:
+            for api_devices in self._devices.values():
+                devices.update(api_devices)
+
+        return devices
+
+    def start(self):
+        """Start pollers and server in background threads."""
+        self._server = _create_server(self.listen, self)
+
+        for api in self.apis:
+            self._threads.append(threading.Thread(target=self._poll,
+                                                  args=(api,), daemon=True))
+
+        self._threads.append(threading.Thread(
+            target=self._server.serve_forever, daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+    def get_address(self):
+        """Get address the server listens at (e.g. the port chosen for 0)."""
+        return self._server.server_address
+
+    def stop(self):
+        """Stop pollers and server."""
+        self._stop.set()
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+            if isinstance(self._server.server_address, str):
+                os.unlink(self._server.server_address)
+
+        for thread in self._threads:
+            thread.join()
+
+    def _poll(self, api):
+        """Poll devices of api until stopped.
+
+        Unexpected errors (e.g. a changed payload) are reported on stderr
+        and polling goes on, so the data served does not silently age.
+        """
+        while not self._stop.is_set():
+            start = time.time()
+
+            try:
+                self.poll(api)
+            except OwletException:
+                pass
+            except Exception:  # pylint: disable=W0718
+                # Reported like socketserver reports errors of handlers
+                traceback.print_exc()
+
+            update_interval = api.get_update_interval() or 10
+            self._stop.wait(max(0, update_interval - (time.time() - start)))
+
+    def poll(self, api):
+        """Poll the active devices of api once, log and cache the data."""
+        devices = api.get_active_devices()
+
+        if self.scheduler is not None:
+            with self._lock:
+                devices = self.scheduler.schedule(devices)
+
+        updated = []
+
+        for device in devices:
+            try:
+                changes = device.update()
+            except OwletException:
+                continue
+
+            updated.append(device)
+
+            for name in changes:
+                myproperty = device.get_property(name)
+                self.changes.append(device.dsn, name, myproperty.timestamp(),
+                                    myproperty.value)
+
+        api.reactivate_all(updated)
+
+        # Devices are only changed by this thread, so serve copies
+        api_devices = {device.dsn: device_json(device)
+                       for device in api.get_devices()}
+
+        with self._lock:
+            self._devices[api] = api_devices
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answer queries of local clients from the daemon's cache."""
+
+    def do_GET(self):
+        """Serve /devices, /devices/<dsn> and /changes."""
+        # pylint: disable=C0103
+        daemon = self.server.owlet_daemon
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/')
+
+        if path == '/devices':
+            self._send(200, list(daemon.get_devices().values()))
+        elif path.startswith('/devices/'):
+            device = daemon.get_devices().get(path[len('/devices/'):])
+
+            if device is None:
+                self._send(404, {'error': 'Unknown device'})
+            else:
+                self._send(200, device)
+        elif path == '/changes':
+            query = parse_qs(url.query)
+
+            try:
+                since = int(query.get('since', ['0'])[0])
+                timeout = min(float(query.get('timeout', ['0'])[0]),
+                              MAX_WAIT)
+            except ValueError:
+                self._send(400, {'error': 'Invalid since or timeout'})
+                return
+
+            sequence, changes = daemon.changes.since(since, timeout)
+            self._send(200, {'seq': sequence, 'changes': changes})
+        else:
+            self._send(404, {'error': 'Unknown path'})
+
+    def _send(self, status, payload):
+        """Send payload as JSON response."""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Do not log every request to stderr."""
+
+
+class _TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTP server handling each client in a thread."""
+
+    daemon_threads = True
+    owlet_daemon = None
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket handling each client in a thread."""
+
+    daemon_threads = True
+    owlet_daemon = None
+
+
+def _create_server(listen, daemon):
+    """Create server for daemon at "host:port" or Unix socket path.
+
+    Anything but a host and a numeric port is a path, which may also be
+    given as "unix:<path>".
+    """
+    host, _, port = listen.rpartition(':')
+
+    if host and port.isdigit() and not listen.startswith('unix:'):
+        server = _TCPServer((host, int(port)), _Handler)
+    else:
+        if listen.startswith('unix:'):
+            listen = listen[len('unix:'):]
+
+        # Left behind by a daemon that did not stop cleanly
+        if os.path.exists(listen) and \
+           stat.S_ISSOCK(os.stat(listen).st_mode):
+            os.unlink(listen)
+
+        server = _UnixServer(listen, _Handler)
+
+    server.owlet_daemon = daemon
+
+    return server
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""Bulk export of LOGGED_DATA_CACHE for many devices and accounts."""
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from .owletexceptions import OwletException
+
+# We really only have little public methods
+# pylint: disable=R0903
+
+
+class OwletExporter():
+    """Download the logged data of many devices in parallel."""
+
+    manifest_name = 'manifest.json'
+    # The manifest is written after this many devices or seconds, and
+    # at the end of the export
+    manifest_batch = 100
+    manifest_interval = 5
+
+    def __init__(self, directory, max_workers=8):
+        """Initialize exporter writing to directory."""
+        self._directory = directory
+        self._max_workers = max_workers
+        self._lock = threading.Lock()
+        self._manifest = {}
+        self._unsaved = 0
+        self._saved_at = 0
+
+    def _manifest_path(self):
+        """Get path of the manifest file."""
+        return os.path.join(self._directory, self.manifest_name)
+
+    def _load_manifest(self):
+        """Load manifest of a previous (possibly interrupted) run."""
+        try:
+            with open(self._manifest_path(), 'r',
+                      encoding='utf-8') as manifest:
+                self._manifest = json.load(manifest)
+        except (IOError, ValueError):
+            self._manifest = {}
+
+    def _save_manifest(self):
+        """Atomically write the manifest, lock must be held."""
+        temporary = self._manifest_path() + '.tmp'
+
+        with open(temporary, 'w', encoding='utf-8') as manifest:
+            json.dump(self._manifest, manifest, indent=1, sort_keys=True)
+
+        os.replace(temporary, self._manifest_path())
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def _is_exported(self, dsn, url):
+        """Check if the log at url has been exported before."""
+        with self._lock:
+            entry = self._manifest.get(dsn)
+
+        return entry is not None and entry['url'] == url and \
+            os.path.exists(os.path.join(self._directory, entry['file']))
+
+    def _export_device(self, device):
+        """Export logged data of one device, return status."""
+        try:
+            device.update()
+
+            logged_data = device.get_property('LOGGED_DATA_CACHE')
+            if logged_data is not None and \
+               self._is_exported(device.dsn, logged_data.value):
+                return 'skipped'
+
+            data = device.download_logged_data(raw=True)
+        except OwletException:
+            return 'failed'
+
+        url = logged_data.value
+        filename = '%s-%s.gz' % (
+            device.dsn, hashlib.sha1(url.encode()).hexdigest()[:16])
+        path = os.path.join(self._directory, filename)
+
+        try:
+            with gzip.open(path + '.tmp', 'wb') as output:
+                output.write(data)
+
+            os.replace(path + '.tmp', path)
+        except OSError:
+            return 'failed'
+
+        with self._lock:
+            self._manifest[device.dsn] = {'url': url, 'file': filename}
+            self._unsaved += 1
+
+            if self._unsaved >= self.manifest_batch or \
+               time.monotonic() - self._saved_at >= self.manifest_interval:
+                try:
+                    self._save_manifest()
+                except OSError:
+                    # Written again with the next batch or at the end
+                    pass
+
+        return 'downloaded'
+
+    def export(self, apis, dsns=None):
+        """Export all devices (or only dsns) of all (logged in) OwletAPIs.
+
+        Returns a dict of DSN and status (downloaded, skipped or failed).
+        """
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+        self._load_manifest()
+        self._saved_at = time.monotonic()
+
+        devices = []
+        for api in apis:
+            for device in api.get_devices():
+                if dsns is None or device.dsn in dsns:
+                    devices.append(device)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+                statuses = pool.map(self._export_device, devices)
+
+                return {device.dsn: status
+                        for device, status in zip(devices, statuses)}
+        finally:
+            with self._lock:
+                if self._unsaved:
+                    self._save_manifest()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Current values of all devices as columns, one row per device."""
+
+from array import array
+import math
+import threading
+
+MISSING = math.nan
+
+
+class OwletFleetTable():
+    """Columnar table of the current numeric property values of a fleet.
+
+    Every property is a column of values and a column of timestamps
+    (array('d'), NaN where unknown), every device a row. Columns are
+    reallocated rather than resized when rows are added, so views handed
+    out by get_column() stay valid (and show the table at that time).
+    """
+
+    def __init__(self):
+        """Initialize empty table."""
+        self._rows = {}
+        self._dsns = []
+        self._capacity = 0
+        self._values = {}
+        self._timestamps = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Get number of devices."""
+        return len(self._dsns)
+
+    def _row(self, dsn):
+        """Get row of dsn, adding it if needed. Call with lock held."""
+        row = self._rows.get(dsn)
+        if row is not None:
+            return row
+
+        row = len(self._dsns)
+        if row == self._capacity:
+            self._grow(max(16, 2 * self._capacity))
+
+        self._rows[dsn] = row
+        self._dsns.append(dsn)
+
+        return row
+
+    def _grow(self, capacity):
+        """Reallocate all columns with capacity rows."""
+        padding = array('d', [MISSING]) * (capacity - self._capacity)
+
+        for columns in (self._values, self._timestamps):
+            for name, column in columns.items():
+                columns[name] = column + padding
+
+        self._capacity = capacity
+
+    def set(self, dsn, name, value, timestamp=None):
+        """Set current value of property name of dsn.
+
+        Values that are not numbers are stored as NaN.
+        """
+        if isinstance(value, (int, float)):
+            value = float(value)
+        else:
+            value = MISSING
+
+        with self._lock:
+            row = self._row(dsn)
+
+            if name not in self._values:
+                # Only numeric properties get a column
+                if math.isnan(value):
+                    return
+
+                self._values[name] = array('d', [MISSING]) * self._capacity
+                self._timestamps[name] = \
+                    array('d', [MISSING]) * self._capacity
+
+            self._values[name][row] = value
+            self._timestamps[name][row] = \
+                MISSING if timestamp is None else timestamp
+
+    def update(self, device, changes):
+        """Write the changed properties of device to the table."""
+        for name in changes:
+            myproperty = device.get_property(name)
+            self.set(device.dsn, name, myproperty.value,
+                     myproperty.timestamp())
+
+    def remove(self, dsn):
+        """Remove row of dsn, moving the last row into its place."""
+        with self._lock:
+            row = self._rows.pop(dsn, None)
+            if row is None:
+                return
+
+            last = len(self._dsns) - 1
+
+            for columns in (self._values, self._timestamps):
+                for column in columns.values():
+                    column[row] = column[last]
+                    column[last] = MISSING
+
+            last_dsn = self._dsns.pop()
+            if row != last:
+                self._dsns[row] = last_dsn
+                self._rows[last_dsn] = row
+
+    def get_dsns(self):
+        """Get DSNs in row order."""
+        with self._lock:
+            return list(self._dsns)
+
+    def get_columns(self):
+        """Get names of all columns."""
+        with self._lock:
+            return list(self._values)
+
+    def get_row(self, dsn):
+        """Get {name: value} of dsn, without unknown values."""
+        with self._lock:
+            row = self._rows[dsn]
+            return {name: column[row] for name, column in self._values.items()
+                    if not math.isnan(column[row])}
+
+    def get_column(self, name, timestamps=False):
+        """Get zero-copy view of the values (or timestamps) of name.
+
+        The view has one float per row (see get_dsns()). Changes of
+        values show up in it, rows added later do not.
+        """
+        with self._lock:
+            columns = self._timestamps if timestamps else self._values
+            return memoryview(columns[name])[:len(self._dsns)]
+
+    def snapshot(self, names):
+        """Get consistent copies of columns names.
+
+        Returns (dsns, {name: array of values}), NaN where unknown.
+        """
+        with self._lock:
+            size = len(self._dsns)
+            missing = array('d', [MISSING]) * size
+
+            return list(self._dsns), {
+                name: self._values[name][:size] if name in self._values
+                else array('d', missing)
+                for name in names}
+
+    def to_numpy(self, names, timestamps=False):
+        """Get {name: numpy array} views of columns (requires numpy)."""
+        # Optional dependency
+        # pylint: disable=C0415,E0401
+        import numpy
+
+        return {name: numpy.frombuffer(self.get_column(name, timestamps),
+                                       dtype=numpy.float64)
+                for name in names}
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""Index of device health: last data timestamp and connection status."""
+
+import heapq
+import time
+
+
+class OwletHealthIndex():
+    """Incrementally maintained index of device health.
+
+    Last data timestamps are kept in a heap ordered by age. Outdated heap
+    entries are dropped lazily, so updates and the oldest device are
+    O(log n) and listing k stale devices costs O(k log k).
+    """
+
+    def __init__(self):
+        """Initialize empty index."""
+        self._last_data = {}
+        self._heap = []
+        self._status = {}
+        self._by_status = {}
+
+    def touch(self, dsn, timestamp):
+        """Record data of dsn at timestamp (seconds since the epoch)."""
+        if self._last_data.get(dsn, float('-inf')) >= timestamp:
+            return
+
+        self._last_data[dsn] = timestamp
+        heapq.heappush(self._heap, (timestamp, dsn))
+
+        # Do not let outdated entries pile up
+        if len(self._heap) > 2 * len(self._last_data) + 16:
+            self._heap = [(last_data, key)
+                          for key, last_data in self._last_data.items()]
+            heapq.heapify(self._heap)
+
+    def get_last_data(self, dsn):
+        """Get timestamp of the last data of dsn."""
+        return self._last_data.get(dsn)
+
+    def oldest(self):
+        """Get (dsn, timestamp) of the device with the oldest data."""
+        while self._heap:
+            timestamp, dsn = self._heap[0]
+
+            if self._last_data.get(dsn) == timestamp:
+                return dsn, timestamp
+
+            heapq.heappop(self._heap)
+
+        return None
+
+    def stale(self, max_age, now=None):
+        """Get DSNs without data for max_age seconds, oldest first.
+
+        Devices that never sent data count from the epoch.
+        """
+        if now is None:
+            now = time.time()
+
+        cutoff = now - max_age
+        # A set, as a removed device that came back can have the same
+        # entry twice
+        found = set()
+
+        # Only walk the part of the heap that is older than cutoff
+        pending = [0]
+        while pending:
+            index = pending.pop()
+            if index >= len(self._heap):
+                continue
+
+            timestamp, dsn = self._heap[index]
+            if timestamp >= cutoff:
+                continue
+
+            if self._last_data.get(dsn) == timestamp:
+                found.add((timestamp, dsn))
+
+            pending.append(2 * index + 1)
+            pending.append(2 * index + 2)
+
+        return [dsn for timestamp, dsn in sorted(found)]
+
+    def set_status(self, dsn, status):
+        """Set connection status of dsn (e.g. Online or Offline)."""
+        if dsn not in self._last_data:
+            self.touch(dsn, 0)
+
+        previous = self._status.get(dsn)
+        if previous == status:
+            return
+
+        if previous is not None:
+            self._by_status[previous].discard(dsn)
+
+        self._status[dsn] = status
+        self._by_status.setdefault(status, set()).add(dsn)
+
+    def get_status(self, dsn):
+        """Get connection status of dsn."""
+        return self._status.get(dsn)
+
+    def with_status(self, status):
+        """Get DSNs of all devices with connection status."""
+        return set(self._by_status.get(status, ()))
+
+    def remove(self, dsn):
+        """Remove dsn from the index."""
+        self._last_data.pop(dsn, None)
+
+        status = self._status.pop(dsn, None)
+        if status is not None:
+            self._by_status[status].discard(dsn)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+"""JSON decoding with the fastest available backend."""
+
+from importlib import import_module
+from json.decoder import JSONDecodeError
+
+# Backends in order of preference, json is always available
+BACKENDS = ('orjson', 'ujson', 'json')
+
+_BACKEND = {}
+
+
+def set_backend(name=None):
+    """Select JSON backend by name, or the fastest available one."""
+    if name is None:
+        for backend in BACKENDS:
+            try:
+                set_backend(backend)
+                return
+            except ImportError:
+                continue
+
+    if name not in BACKENDS:
+        raise ImportError('Unknown JSON backend %s' % name)
+
+    module = import_module(name)
+    _BACKEND['name'] = name
+    _BACKEND['loads'] = module.loads
+
+
+def get_backend():
+    """Get name of the selected JSON backend."""
+    return _BACKEND['name']
+
+
+def loads(data):
+    """Decode JSON from bytes or str.
+
+    Raises JSONDecodeError for invalid documents, whatever the backend.
+    """
+    try:
+        if _BACKEND['name'] == 'json' and isinstance(data, bytes):
+            data = data.decode('utf-8')
+
+        return _BACKEND['loads'](data)
+    except JSONDecodeError:
+        raise
+    except ValueError as error:
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+
+        raise JSONDecodeError(str(error), data, 0)
+
+
+set_backend()
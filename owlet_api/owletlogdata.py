@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""Fixed width binary file format for logged vital signs."""
+
+import mmap
+import struct
+
+# File header: magic, format version, size of one record
+HEADER = struct.Struct('<8sII')
+MAGIC = b'OWLETLOG'
+VERSION = 1
+
+# One record: timestamp (seconds since epoch), heart rate, oxygen level and
+# movement. Values that are not known are stored as MISSING.
+RECORD = struct.Struct('<dhhh')
+FIELDS = ('timestamp', 'heart_rate', 'oxygen_level', 'movement')
+MISSING = -1
+
+# Layout for numpy.memmap(path, dtype=NUMPY_DTYPE, offset=HEADER.size)
+NUMPY_DTYPE = [('timestamp', '<f8'), ('heart_rate', '<i2'),
+               ('oxygen_level', '<i2'), ('movement', '<i2')]
+
+# Mapping of record fields to Owlet properties
+PROPERTIES = {
+    'heart_rate': 'HEART_RATE',
+    'oxygen_level': 'OXYGEN_LEVEL',
+    'movement': 'MOVEMENT',
+}
+
+
+def _to_field(value):
+    """Convert a property value to a record field."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def write_records(path, records):
+    """Write (timestamp, heart rate, oxygen level, movement) records."""
+    count = 0
+
+    with open(path, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+
+        for timestamp, heart_rate, oxygen_level, movement in records:
+            output.write(RECORD.pack(timestamp,
+                                     _to_field(heart_rate),
+                                     _to_field(oxygen_level),
+                                     _to_field(movement)))
+            count += 1
+
+    return count
+
+
+def records_from_store(store, dsn, start=None, end=None):
+    """Merge vital sign samples from an OwletStore into records.
+
+    Every sample of one of the properties yields a record, the other
+    fields carry the last known value.
+    """
+    samples = []
+    for field, name in PROPERTIES.items():
+        for timestamp, value in store.query(dsn, name, start, end):
+            samples.append((timestamp, FIELDS.index(field), value))
+
+    samples.sort(key=lambda sample: (sample[0], sample[1]))
+
+    current = [None, MISSING, MISSING, MISSING]
+    for timestamp, field, value in samples:
+        if current[0] is not None and current[0] != timestamp:
+            yield tuple(current)
+
+        current[0] = timestamp
+        current[field] = _to_field(value)
+
+    if current[0] is not None:
+        yield tuple(current)
+
+
+class OwletLogFile():
+    """Memory mapped read access to a file created by write_records."""
+
+    def __init__(self, path):
+        """Open and map the file at path."""
+        with open(path, 'rb') as logfile:
+            self._mmap = mmap.mmap(logfile.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            self.close()
+            raise ValueError('File too short for header')
+
+        magic, version, record_size = HEADER.unpack_from(self._mmap)
+
+        if magic != MAGIC or version != VERSION or \
+           record_size != RECORD.size:
+            self.close()
+            raise ValueError('Unsupported file format')
+
+        self._count = (len(self._mmap) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        """Return number of records."""
+        return self._count
+
+    def __getitem__(self, index):
+        """Return one record, unpacked straight from the mapping."""
+        if index < 0:
+            index += self._count
+
+        if index < 0 or index >= self._count:
+            raise IndexError('Record index out of range')
+
+        return RECORD.unpack_from(self._mmap,
+                                  HEADER.size + index * RECORD.size)
+
+    def __iter__(self):
+        """Iterate over all records."""
+        end = HEADER.size + self._count * RECORD.size
+        view = memoryview(self._mmap)[HEADER.size:end]
+
+        try:
+            yield from RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def close(self):
+        """Unmap the file."""
+        self._mmap.close()
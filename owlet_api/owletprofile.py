@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""Low overhead timing of the phases of a polling cycle."""
+
+from collections import deque
+import time
+
+# Phases measured by OwletAPI, Owlet and the CLI
+PHASES = ('http', 'json', 'parse', 'sleep', 'output')
+
+
+class _Phase():
+    """Context manager adding its duration to a profiler."""
+
+    __slots__ = ('_profiler', '_name', '_start')
+
+    def __init__(self, profiler, name):
+        """Initialize phase of profiler."""
+        self._profiler = profiler
+        self._name = name
+        self._start = None
+
+    def __enter__(self):
+        """Start timing."""
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop timing and record duration."""
+        self._profiler.add(self._name, time.perf_counter() - self._start)
+
+
+class _NullPhase():
+    """Context manager doing nothing, used while profiling is off."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        """Do nothing."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Do nothing."""
+
+
+NULL_PHASE = _NullPhase()
+
+
+class OwletProfiler():
+    """Collect durations per phase and report percentiles."""
+
+    def __init__(self, samples=10000):
+        """Initialize, keeping the last samples durations per phase."""
+        self._samples = samples
+        self._durations = {}
+        self._totals = {}
+
+    def phase(self, name):
+        """Get context manager timing one occurrence of phase name."""
+        return _Phase(self, name)
+
+    def add(self, name, seconds):
+        """Record duration of one occurrence of phase name."""
+        if name not in self._durations:
+            self._durations[name] = deque(maxlen=self._samples)
+            self._totals[name] = [0, 0.0]
+
+        self._durations[name].append(seconds)
+        self._totals[name][0] += 1
+        self._totals[name][1] += seconds
+
+    def percentiles(self, name, points=(50, 90, 99)):
+        """Get {point: seconds} percentiles of the recent durations."""
+        durations = sorted(self._durations.get(name, ()))
+
+        if not durations:
+            return {point: None for point in points}
+
+        return {point: durations[min(len(durations) - 1,
+                                     len(durations) * point // 100)]
+                for point in points}
+
+    def report(self):
+        """Get report of all phases as text."""
+        lines = ['%-8s %8s %10s %10s %10s %10s' %
+                 ('phase', 'count', 'p50 ms', 'p90 ms', 'p99 ms', 'total s')]
+
+        names = [name for name in PHASES if name in self._durations] + \
+            sorted(name for name in self._durations if name not in PHASES)
+
+        for name in names:
+            percentiles = self.percentiles(name)
+            count, total = self._totals[name]
+            lines.append('%-8s %8d %10.2f %10.2f %10.2f %10.2f' %
+                         (name, count, percentiles[50] * 1000,
+                          percentiles[90] * 1000, percentiles[99] * 1000,
+                          total))
+
+        return '\n'.join(lines)
+
+    def dump(self, stream):
+        """Write report to stream."""
+        stream.write(self.report() + '\n')
+        stream.flush()
@@ -1,46 +1,194 @@
 #!/usr/bin/env python
 """Class to keep information of one property."""
 
-from dateutil.parser import parse
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from .owletschema import DEFAULT_SCHEMA
 
 # We really only have little public methods
 # pylint: disable=R0903
 
+# Format the Ayla cloud uses for data_updated_at
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+# Number of recent intervals the update interval is estimated from
+INTERVAL_WINDOW = 9
+
+# Number of intervals before the estimate is trusted, a single burst of a
+# rarely changing property says nothing about its cadence
+MIN_INTERVALS = 3
+
+
+# Many properties (and polls) carry the very same timestamp
+@lru_cache(maxsize=1024)
+def parse_timestamp(timestamp):
+    """Parse timestamp, importing dateutil only for unusual formats."""
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(
+            tzinfo=timezone.utc)
+    except ValueError:
+        # pylint: disable=C0415
+        from dateutil.parser import parse
+        return parse(timestamp)
+
+
+def format_timestamp(timestamp):
+    """Format timestamp as data_updated_at, "null" for None."""
+    if timestamp is None:
+        return "null"
+
+    if timestamp.microsecond or timestamp.utcoffset():
+        return timestamp.isoformat()
+
+    return timestamp.strftime(TIMESTAMP_FORMAT)
+
+
+def decode_value(base_type, value):
+    """Decode value according to base_type, keep it as is if that fails.
+
+    Booleans are decoded to 0 and 1, as sent by the Owlet.
+    """
+    if value is None:
+        return None
+
+    try:
+        if base_type in ('integer', 'boolean'):
+            return int(value)
+        if base_type == 'decimal':
+            return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    return value
+
+
+def _median(values):
+    """Get median of a non-empty list of numbers."""
+    values = sorted(values)
+    middle = len(values) // 2
+
+    if len(values) % 2:
+        return values[middle]
+
+    return (values[middle - 1] + values[middle]) / 2
+
+
+def estimate_interval(intervals):
+    """Estimate the typical one of intervals, robust against outliers.
+
+    Intervals more than three median absolute deviations away from the
+    median (single bursts or gaps) are dropped before taking the median.
+    """
+    median = _median(intervals)
+    deviation = _median([abs(interval - median) for interval in intervals])
+
+    return _median([interval for interval in intervals
+                    if abs(interval - median) <= 3 * deviation])
+
 
 class OwletProperty():
-    """Class to keep information of one property."""
+    """Class to keep information of one property.
+
+    Name, display name and base type are kept in a definition shared with
+    the same property of other devices (see owletschema).
+    """
+
+    __slots__ = ('definition', 'value', 'last_update', 'update_interval',
+                 'key', '_intervals', '_schema')
 
-    def __init__(self, json):
+    def __init__(self, json, schema=None):
         """Initialize property from json object as argument."""
-        self.name = None
-        self.display_name = None
+        if schema is None:
+            schema = DEFAULT_SCHEMA
+
+        self._schema = schema
+        self.definition = None
         self.value = None
         self.last_update = None
-        self.minimum_update_interval = None
+        self.update_interval = None
         self.key = None
+        # Created with the first interval, most properties never change
+        self._intervals = None
 
         self._from_json(json)
 
+    @property
+    def name(self):
+        """Get name of the property."""
+        return self.definition.name
+
+    @property
+    def display_name(self):
+        """Get human readable name of the property."""
+        return self.definition.display_name
+
+    @property
+    def base_type(self):
+        """Get base type (e.g. integer, string) of the property."""
+        return self.definition.base_type
+
     def update(self, json):
-        """Update property from JSON."""
-        self._from_json(json)
+        """Update property from JSON, return whether it has changed."""
+        return self._from_json(json)
+
+    def to_json(self):
+        """Get property as JSON object, as it is parsed from."""
+        return {
+            'name': self.name,
+            'display_name': self.display_name,
+            'base_type': self.base_type,
+            'value': self.value,
+            'key': self.key,
+            'data_updated_at': format_timestamp(self.last_update),
+        }
+
+    def get_intervals(self):
+        """Get the recent update intervals the estimate is based on."""
+        return list(self._intervals or ())
+
+    def set_intervals(self, intervals):
+        """Set recent update intervals (e.g. restored) and estimate."""
+        self._intervals = deque(intervals, maxlen=INTERVAL_WINDOW)
+
+        if self._intervals:
+            self.update_interval = estimate_interval(self._intervals)
+        else:
+            self.update_interval = None
+
+    def timestamp(self):
+        """Get last update in seconds since the epoch, None if unknown."""
+        if self.last_update is None:
+            return None
+
+        return self.last_update.timestamp()
 
     def _from_json(self, json):
         """Parse JSON and update attributes of class."""
-        self.name = json['name']
-        self.display_name = json['display_name']
-        self.value = json['value']
+        self.definition = self._schema.define(
+            json['name'], json['display_name'], json['base_type'])
+        value = decode_value(self.definition.base_type, json['value'])
+        last_update = self.last_update
+        changed = value != self.value
+
+        self.value = value
         self.key = json['key']
 
         if json['data_updated_at'] != "null":
-            new_update = parse(json['data_updated_at'])
+            new_update = parse_timestamp(json['data_updated_at'])
 
             if self.last_update is not None and \
                new_update != self.last_update:
-                update_interval = new_update - self.last_update
+                interval = (new_update - self.last_update).total_seconds()
 
-                if self.minimum_update_interval is None or \
-                   update_interval.seconds < self.minimum_update_interval:
-                    self.minimum_update_interval = update_interval.seconds
+                if interval > 0:
+                    if self._intervals is None:
+                        self._intervals = deque(maxlen=INTERVAL_WINDOW)
+
+                    self._intervals.append(interval)
+                    self.update_interval = estimate_interval(
+                        self._intervals)
 
             self.last_update = new_update
+
+        return changed or self.last_update != last_update
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Bounded queue of changes between pollers and slow consumers."""
+
+from collections import OrderedDict
+import queue
+import threading
+
+# What put() does when the queue is full:
+# block: wait for space (backpressure on the poller)
+# drop_oldest: discard the oldest entry
+# coalesce: keep only the latest entry per key (e.g. DSN), discarding the
+# oldest entry if a new key does not fit
+POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+
+class OwletChangeQueue():
+    """Thread-safe bounded FIFO queue of (key, item) with overflow policy."""
+
+    def __init__(self, maxsize=1000, policy='block'):
+        """Initialize empty queue of at most maxsize entries."""
+        if policy not in POLICIES:
+            raise ValueError('Unknown overflow policy %s' % policy)
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._entries = OrderedDict()
+        self._sequence = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        """Get number of queued entries."""
+        with self._condition:
+            return len(self._entries)
+
+    def put(self, key, item, timeout=None):
+        """Queue item of key, according to the overflow policy.
+
+        With the block policy, raises queue.Full if there was no space
+        within timeout seconds. Items put after close() are dropped.
+        """
+        with self._condition:
+            # Nobody will consume it anymore
+            if self._closed:
+                self.dropped += 1
+                return
+
+            if self.policy == 'coalesce' and key in self._entries:
+                self._entries[key] = item
+                self.dropped += 1
+                return
+
+            if self.policy == 'block':
+                if not self._condition.wait_for(
+                        lambda: self._closed or
+                        len(self._entries) < self.maxsize,
+                        timeout):
+                    raise queue.Full
+
+                if self._closed:
+                    self.dropped += 1
+                    return
+            elif len(self._entries) >= self.maxsize:
+                self._entries.popitem(last=False)
+                self.dropped += 1
+
+            if self.policy != 'coalesce':
+                # Entries are only unique per key when coalescing
+                self._sequence += 1
+                key = (self._sequence, key)
+
+            self._entries[key] = item
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        """Get oldest (key, item), waiting for it up to timeout seconds.
+
+        Returns None once the queue is closed and empty. Raises
+        queue.Empty if nothing arrived within timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._closed or self._entries, timeout):
+                raise queue.Empty
+
+            if not self._entries:
+                return None
+
+            key, item = self._entries.popitem(last=False)
+            self._condition.notify_all()
+
+        if self.policy != 'coalesce':
+            key = key[1]
+
+        return key, item
+
+    def close(self):
+        """Let get() return None once all queued entries are consumed."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""Record HTTP exchanges of OwletAPI and replay them without network."""
+
+import base64
+from collections import deque
+import json
+import threading
+import time
+import requests
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+# We really only have little public methods
+# pylint: disable=R0903
+
+
+def _request_url(method, url, params=None):
+    """Get full URL of a request, including query parameters."""
+    return requests.Request(method, url, params=params).prepare().url
+
+
+class OwletRecorder():
+    """Session recording every exchange to an append-only capture file.
+
+    Each exchange is one JSON line. Note that the capture contains the
+    responses as sent by the server, including the auth token.
+    """
+
+    def __init__(self, path, session=None):
+        """Initialize recorder appending to path."""
+        if session is None:
+            session = requests.Session()
+
+        self._session = session
+        self._lock = threading.Lock()
+        # pylint: disable=R1732
+        self._capture = open(path, 'a', encoding='utf-8')
+
+    def _write(self, exchange):
+        """Append one exchange to the capture file."""
+        line = json.dumps(exchange, separators=(',', ':'))
+
+        with self._lock:
+            self._capture.write(line + '\n')
+            self._capture.flush()
+
+    def request(self, method, url, **kwargs):
+        """Perform and record HTTP request."""
+        exchange = {
+            'time': time.time(),
+            'method': method,
+            'url': _request_url(method, url, kwargs.get('params')),
+            'status': None,
+        }
+
+        try:
+            result = self._session.request(method, url, **kwargs)
+        except requests.RequestException:
+            self._write(exchange)
+            raise
+
+        exchange['status'] = result.status_code
+        try:
+            exchange['text'] = result.content.decode('utf-8')
+        except UnicodeDecodeError:
+            exchange['body'] = base64.b64encode(result.content).decode()
+
+        self._write(exchange)
+        return result
+
+    def close(self):
+        """Close the capture file."""
+        self._capture.close()
+
+
+class OwletReplayResponse():
+    """Response replayed from a capture, subset of requests.Response."""
+
+    def __init__(self, exchange):
+        """Initialize response from recorded exchange."""
+        self.url = exchange['url']
+        self.status_code = exchange['status']
+
+        if 'body' in exchange:
+            self.content = base64.b64decode(exchange['body'])
+        else:
+            self.content = exchange.get('text', '').encode('utf-8')
+
+    @property
+    def text(self):
+        """Get content as text."""
+        return self.content.decode('utf-8', 'replace')
+
+    def json(self):
+        """Decode content as JSON."""
+        return json.loads(self.text)
+
+
+class OwletReplay():
+    """Session answering requests from a capture file.
+
+    Exchanges are replayed in recorded order per method and URL. With
+    speed set, the recorded pauses between exchanges are kept, divided by
+    speed; otherwise responses are returned immediately.
+    """
+
+    def __init__(self, path, speed=None):
+        """Initialize replay from capture at path."""
+        self._speed = speed
+        self._lock = threading.Lock()
+        self._exchanges = {}
+        self._first_recorded = None
+        self._first_replayed = None
+
+        with open(path, 'r', encoding='utf-8') as capture:
+            for line in capture:
+                if not line.strip():
+                    continue
+
+                exchange = json.loads(line)
+                key = (exchange['method'], exchange['url'])
+                self._exchanges.setdefault(key, deque()).append(exchange)
+
+                if self._first_recorded is None:
+                    self._first_recorded = exchange['time']
+
+    def _wait(self, exchange):
+        """Keep recorded timing, scaled by speed."""
+        if self._speed is None:
+            return
+
+        if self._first_replayed is None:
+            self._first_replayed = time.time()
+
+        due = self._first_replayed + \
+            (exchange['time'] - self._first_recorded) / self._speed
+        time.sleep(max(0, due - time.time()))
+
+    def request(self, method, url, **kwargs):
+        """Replay HTTP request."""
+        key = (method, _request_url(method, url, kwargs.get('params')))
+
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise RequestsConnectionError(
+                    'No recorded exchange for %s %s' % key)
+
+            exchange = exchanges.popleft()
+
+        self._wait(exchange)
+
+        if exchange['status'] is None:
+            raise RequestsConnectionError('Recorded request failed')
+
+        return OwletReplayResponse(exchange)
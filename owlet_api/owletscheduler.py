@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""Share a fixed request budget among devices by priority."""
+
+import time
+from .owletalert import OwletRule
+
+# Priority classes, most important first
+PRIORITIES = ('critical', 'high', 'normal', 'low')
+
+# Vitals close to the usual alert thresholds make a device critical. A
+# value of 0 means there is no reading (e.g. sock not placed).
+DEFAULT_RULES = (
+    OwletRule('oxygen near low', 'OXYGEN_LEVEL', 'inside', (1, 94)),
+    OwletRule('heart rate near low', 'HEART_RATE', 'inside', (1, 99)),
+    OwletRule('heart rate near high', 'HEART_RATE', '>', 170),
+)
+
+
+class OwletScheduler():
+    """Decide which devices to poll now within a request budget.
+
+    Each device is due again update interval seconds after its last
+    poll. When more devices are due than the budget (requests per
+    second) allows, they are polled by priority, the longest overdue
+    first, and the rest waits:
+    critical: latest values meet one of rules (e.g. vitals near alert
+    thresholds),
+    high / normal / low: as set with set_priority(), by default normal,
+    or low if the device sent no data for idle_after seconds.
+    """
+
+    # pylint: disable=R0902
+    def __init__(self, budget=None, rules=DEFAULT_RULES, idle_after=60,
+                 burst=60):
+        """Initialize, budget in requests per second (None: unlimited).
+
+        Unused budget is saved up for at most burst seconds.
+        """
+        self.budget = budget
+        self.rules = list(rules)
+        self.idle_after = idle_after
+        self.burst = burst
+        self.shed = {priority: 0 for priority in PRIORITIES}
+        self._priorities = {}
+        self._next_poll = {}
+        self._tokens = None
+        self._last_schedule = None
+
+    def set_priority(self, dsn, priority):
+        """Set priority class of dsn, None to reset it to normal."""
+        if priority is None:
+            self._priorities.pop(dsn, None)
+            return
+
+        if priority not in PRIORITIES:
+            raise ValueError('Unknown priority %s' % priority)
+
+        self._priorities[dsn] = priority
+
+    def get_priority(self, device, now=None):
+        """Get current priority class of device."""
+        for rule in self.rules:
+            myproperty = device.get_property(rule.property)
+
+            if myproperty is not None and rule.test(myproperty.value):
+                return 'critical'
+
+        priority = self._priorities.get(device.dsn)
+        if priority is not None:
+            return priority
+
+        if now is None:
+            now = time.time()
+
+        last_data = device.owlet_api.get_health_index().get_last_data(
+            device.dsn)
+        if last_data is not None and now - last_data >= self.idle_after:
+            return 'low'
+
+        return 'normal'
+
+    def _refill(self, now):
+        """Add budget for the time since the last schedule()."""
+        capacity = self.budget * self.burst
+
+        if self._last_schedule is None:
+            self._tokens = capacity
+        else:
+            self._tokens = min(capacity, self._tokens + self.budget *
+                               max(0, now - self._last_schedule))
+
+        self._last_schedule = now
+
+    def schedule(self, devices, now=None):
+        """Get the devices of devices to poll now, most important first.
+
+        Every device returned costs one request of the budget.
+        """
+        if now is None:
+            now = time.time()
+
+        due = []
+
+        for device in devices:
+            next_poll = self._next_poll.get(device.dsn, 0)
+
+            if next_poll <= now:
+                rank = PRIORITIES.index(self.get_priority(device, now))
+                due.append((rank, next_poll, device))
+
+        due.sort(key=lambda entry: entry[:2])
+
+        if self.budget is not None:
+            self._refill(now)
+
+        scheduled = []
+
+        for rank, _, device in due:
+            if self.budget is not None:
+                if self._tokens < 1:
+                    self.shed[PRIORITIES[rank]] += 1
+                    continue
+
+                self._tokens -= 1
+
+            self._next_poll[device.dsn] = now + \
+                device.get_update_interval()
+            scheduled.append(device)
+
+        return scheduled
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""Registry of property definitions shared by all devices."""
+
+from collections import namedtuple
+import sys
+
+# Definition of a property, identical on all devices
+OwletPropertyDefinition = namedtuple(
+    'OwletPropertyDefinition', ['index', 'name', 'display_name', 'base_type'])
+
+
+class OwletSchema():
+    """Registry of property definitions, numbered in order of appearance.
+
+    All properties of the same name share one definition, so name,
+    display name and base type are kept once instead of per device.
+    """
+
+    def __init__(self):
+        """Initialize empty registry."""
+        self._definitions = {}
+        self._by_index = []
+
+    def __len__(self):
+        """Get number of defined properties."""
+        return len(self._by_index)
+
+    def define(self, name, display_name, base_type):
+        """Get the definition of a property, registering it if needed.
+
+        A property whose display name or base type changed gets a new
+        definition with the same index.
+        """
+        definition = self._definitions.get(name)
+
+        if definition is not None and \
+           definition.display_name == display_name and \
+           definition.base_type == base_type:
+            return definition
+
+        if definition is None:
+            index = len(self._by_index)
+            self._by_index.append(None)
+        else:
+            index = definition.index
+
+        if isinstance(display_name, str):
+            display_name = sys.intern(display_name)
+
+        definition = OwletPropertyDefinition(
+            index, sys.intern(name), display_name, base_type)
+        self._definitions[definition.name] = definition
+        self._by_index[index] = definition
+
+        return definition
+
+    def get(self, name):
+        """Get definition of property name, None if unknown."""
+        return self._definitions.get(name)
+
+    def get_by_index(self, index):
+        """Get definition of the property with index."""
+        return self._by_index[index]
+
+    def names(self):
+        """Get names of all properties, in index order."""
+        return [definition.name for definition in self._by_index]
+
+
+# Used by properties created without the schema of an OwletAPI
+DEFAULT_SCHEMA = OwletSchema()
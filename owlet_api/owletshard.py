@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Poll large fleets of Owlets with several worker processes."""
+
+import multiprocessing
+import queue
+import time
+import zlib
+from .owletapi import OwletAPI
+from .owletexceptions import OwletException
+from .owletexceptions import OwletPermanentCommunicationException
+
+
+def shard_of(key, shards):
+    """Get shard of a DSN or email address, stable across processes."""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def _login(accounts, stop):
+    """Login to all accounts, retry on temporary problems."""
+    apis = []
+
+    for email, password in accounts:
+        api = OwletAPI(email, password)
+
+        while not stop.is_set():
+            try:
+                api.login()
+                apis.append(api)
+                break
+            except OwletPermanentCommunicationException:
+                break
+            except OwletException:
+                stop.wait(10)
+
+    return apis
+
+
+def change_records(device, changes):
+    """Build (dsn, property, timestamp, value) records of changes."""
+    records = []
+
+    for name in changes:
+        myproperty = device.get_property(name)
+        records.append((device.dsn, name, myproperty.timestamp(),
+                        myproperty.value))
+
+    return records
+
+
+# pylint: disable=R0913,R0914
+def poll_shard(accounts, shard, shards, records, stop, *,
+               partition='dsn', refresh_interval=300):
+    """Poll the devices of one shard until stop is set.
+
+    Change records (dsn, property, timestamp, value) are put into records,
+    one list per device and poll. devices.json is re-read every
+    refresh_interval seconds, so new devices are picked up by the shard
+    they hash to and removed devices are no longer polled. Offline
+    devices are only probed now and then (see get_active_devices).
+    """
+    if partition == 'account':
+        accounts = [account for account in accounts
+                    if shard_of(account[0], shards) == shard]
+
+    apis = _login(accounts, stop)
+
+    for api in apis:
+        api.devices_refresh_interval = refresh_interval
+
+    while not stop.is_set():
+        start = time.time()
+        update_interval = None
+
+        for api in apis:
+            try:
+                devices = api.get_active_devices()
+            except OwletException:
+                continue
+
+            updated = []
+
+            for device in devices:
+                if partition == 'dsn' and \
+                   shard_of(device.dsn, shards) != shard:
+                    continue
+
+                try:
+                    changes = device.update()
+                except OwletException:
+                    continue
+
+                if update_interval is None or \
+                   device.get_update_interval() < update_interval:
+                    update_interval = device.get_update_interval()
+
+                updated.append(device)
+
+                if changes:
+                    records.put(change_records(device, changes))
+
+            # The changes are reported whether or not this works out
+            try:
+                api.reactivate_all(updated)
+            except OwletException:
+                pass
+
+        if update_interval is None:
+            update_interval = 10
+
+        stop.wait(max(0, update_interval - (time.time() - start)))
+
+
+class OwletShardedPoller():
+    """Coordinate worker processes that each poll a shard of the devices.
+
+    Devices are partitioned by hash of their DSN (each worker logs into
+    all accounts) or by hash of the account's email address.
+    """
+
+    def __init__(self, accounts, shards=None, partition='dsn',
+                 refresh_interval=300):
+        """Initialize with list of (email, password) tuples."""
+        if shards is None:
+            shards = multiprocessing.cpu_count()
+
+        self._accounts = list(accounts)
+        self._shards = shards
+        self._partition = partition
+        self._refresh_interval = refresh_interval
+        self._records = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._processes = []
+
+    def start(self):
+        """Start one worker process per shard."""
+        self._stop.clear()
+
+        for shard in range(self._shards):
+            process = multiprocessing.Process(
+                target=poll_shard,
+                args=(self._accounts, shard, self._shards, self._records,
+                      self._stop),
+                kwargs={'partition': self._partition,
+                        'refresh_interval': self._refresh_interval},
+                daemon=True)
+            process.start()
+            self._processes.append(process)
+
+    def records(self, timeout=None):
+        """Iterate over change records as they arrive from the workers.
+
+        Stops after timeout seconds without records, if given.
+        """
+        while True:
+            try:
+                batch = self._records.get(timeout=timeout)
+            except queue.Empty:
+                return
+
+            yield from batch
+
+    def stop(self, timeout=10):
+        """Stop all worker processes."""
+        self._stop.set()
+
+        for process in self._processes:
+            process.join(timeout)
+
+            if process.is_alive():
+                process.terminate()
+
+        self._processes = []
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""Persistent time series store for Owlet property samples."""
+
+import sqlite3
+import time
+
+
+class OwletStore():
+    """Append-only SQLite store for (dsn, property, timestamp, value)."""
+
+    def __init__(self, path, batch_size=500):
+        """Open (or create) the store at path."""
+        self._connection = sqlite3.connect(path)
+        self._batch_size = batch_size
+        self._pending = []
+
+        # WAL allows readers (e.g. a dashboard) while we keep appending
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+
+        # The primary key doubles as the per DSN / property time index and
+        # makes re-recording an unchanged property a no-op
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS samples ('
+            'dsn TEXT NOT NULL, '
+            'property TEXT NOT NULL, '
+            'timestamp REAL NOT NULL, '
+            'value, '
+            'PRIMARY KEY (dsn, property, timestamp)) WITHOUT ROWID')
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS samples_timestamp '
+            'ON samples (timestamp)')
+        self._connection.commit()
+
+    def add_sample(self, dsn, name, timestamp, value):
+        """Queue one sample, timestamp in seconds since the epoch."""
+        self._pending.append((dsn, name, timestamp, value))
+
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def record(self, device):
+        """Queue the current value of every property of an Owlet."""
+        for name, myproperty in device.get_properties().items():
+            if myproperty.last_update is None:
+                continue
+
+            self.add_sample(device.dsn, name,
+                            myproperty.last_update.timestamp(),
+                            myproperty.value)
+
+    def flush(self):
+        """Write all queued samples in one transaction."""
+        if not self._pending:
+            return
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?)',
+                self._pending)
+
+        self._pending = []
+
+    def query(self, dsn, name, start=None, end=None):
+        """Iterate over (timestamp, value) of one property in time order."""
+        self.flush()
+
+        if start is None:
+            start = float('-inf')
+        if end is None:
+            end = float('inf')
+
+        # The cursor streams rows, nothing is loaded upfront
+        return self._connection.execute(
+            'SELECT timestamp, value FROM samples '
+            'WHERE dsn = ? AND property = ? '
+            'AND timestamp >= ? AND timestamp <= ? '
+            'ORDER BY timestamp', (dsn, name, start, end))
+
+    def last(self, dsn, name, seconds, now=None):
+        """Iterate over the samples of the last seconds of one property."""
+        if now is None:
+            now = time.time()
+
+        return self.query(dsn, name, start=now - seconds, end=now)
+
+    def purge(self, before):
+        """Delete all samples older than before (retention)."""
+        self.flush()
+
+        with self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM samples WHERE timestamp < ?', (before,))
+
+        return cursor.rowcount
+
+    def downsample(self, before, bucket):
+        """Keep only the first sample per bucket seconds older than before."""
+        self.flush()
+
+        with self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM samples WHERE timestamp < :before '
+                'AND timestamp > ('
+                'SELECT MIN(older.timestamp) FROM samples AS older '
+                'WHERE older.dsn = samples.dsn '
+                'AND older.property = samples.property '
+                'AND older.timestamp >= '
+                'CAST(samples.timestamp / :bucket AS INTEGER) * :bucket '
+                'AND older.timestamp <= samples.timestamp)',
+                {'before': before, 'bucket': bucket})
+
+        return cursor.rowcount
+
+    def close(self):
+        """Flush pending samples and close the database."""
+        self.flush()
+        self._connection.close()
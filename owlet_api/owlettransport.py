@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""HTTP transports OwletAPI can send its requests through."""
+
+from functools import lru_cache
+from importlib import import_module
+import requests
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import ConnectTimeout, ReadTimeout, RequestException
+
+TRANSPORTS = ('http1', 'http2')
+
+
+@lru_cache(maxsize=1)
+def accept_encoding():
+    """Get Accept-Encoding header value for the installed decoders.
+
+    gzip and deflate are always supported, brotli (br) only if one of
+    the brotli modules is installed for requests and httpx to use.
+    """
+    encodings = ['gzip', 'deflate']
+
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            import_module(module)
+        except ImportError:
+            continue
+
+        encodings.append('br')
+        break
+
+    return ', '.join(encodings)
+
+
+def transfer_size(response):
+    """Get number of bytes of response body as sent over the network."""
+    # httpx
+    downloaded = getattr(response, 'num_bytes_downloaded', None)
+    if downloaded is not None:
+        return downloaded
+
+    # requests, urllib3 counts the bytes read before decompression
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        try:
+            return raw.tell()
+        except (OSError, ValueError):
+            pass
+
+    length = response.headers.get('Content-Length') \
+        if hasattr(response, 'headers') else None
+    if length is not None and length.isdigit():
+        return int(length)
+
+    return len(response.content)
+
+
+def create_session(transport='http1', **kwargs):
+    """Create session for transport (see TRANSPORTS)."""
+    if transport == 'http1':
+        return requests.Session()
+
+    if transport == 'http2':
+        return OwletHttp2Session(**kwargs)
+
+    raise ValueError('Unknown transport %s' % transport)
+
+
+class OwletHttp2Session():
+    """Session multiplexing requests over HTTP/2 connections (httpx).
+
+    Behaves like a requests.Session as far as OwletAPI is concerned:
+    timeouts are given as (connect, read) and errors are raised as
+    requests exceptions. It is safe to use from several threads, which
+    then share one connection per host.
+    """
+
+    def __init__(self, max_connections=10):
+        """Initialize, requires httpx with HTTP/2 support installed."""
+        # Optional dependency
+        # pylint: disable=C0415,E0401
+        import httpx
+
+        self._httpx = httpx
+        self._client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=max_connections))
+
+    # pylint: disable=R0913
+    def request(self, method, url, *, headers=None, json=None,
+                data=None, params=None, timeout=None):
+        """Perform request, arguments as for requests.Session."""
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = self._httpx.Timeout(connect=connect, read=read,
+                                          write=read, pool=connect)
+
+        try:
+            return self._client.request(method, url, headers=headers,
+                                        json=json, content=data,
+                                        params=params, timeout=timeout)
+        except self._httpx.ConnectTimeout as error:
+            raise ConnectTimeout(str(error))
+        except self._httpx.TimeoutException as error:
+            raise ReadTimeout(str(error))
+        except self._httpx.TransportError as error:
+            raise RequestsConnectionError(str(error))
+        except self._httpx.HTTPError as error:
+            raise RequestException(str(error))
+
+    def close(self):
+        """Close all connections."""
+        self._client.close()
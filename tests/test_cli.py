@@ -5,7 +5,9 @@ import requests
 import pytest
 import time
 import copy
+import json
 import sys
+import subprocess
 from unittest.mock import Mock, patch
 from freezegun import freeze_time
 
@@ -15,6 +17,10 @@ from owlet_api.owletexceptions import OwletPermanentCommunicationException
 from owlet_api.owletexceptions import OwletTemporaryCommunicationException
 from owlet_api.owletexceptions import OwletNotInitializedException
 from owlet_api.cli import cli
+from owlet_api.owletstore import OwletStore
+
+# For tests that patch time.sleep
+SLEEP = time.sleep
 
 LOGIN_PAYLOAD = {
     'access_token': 'testtoken',
@@ -320,4 +326,351 @@ def test_cli_main():
             with patch.object(cli.sys, 'exit') as mock_exit:
                 cli.init()
             
-                assert mock_exit.call_args[0][0] == 42
\ No newline at end of file
+                assert mock_exit.call_args[0][0] == 42
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_store(sleep_mock, tmp_path):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    path = str(tmp_path / 'owlet.db')
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--store', path, 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    store = OwletStore(path)
+    assert list(store.query('c', 'APP_ACTIVE')) == [(1546163003.0, 0)]
+    store.close()
+
+@responses.activate
+def test_cli_export_ok(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'http://de.mo/file',
+              json=DOWNLOAD_DATA, status=200)
+    responses.add(responses.GET, 'https://ayla-device-field-production-1a2039d9.s3.amazonaws.com/X?AWSAccessKeyId=Y&Expires=1234&Signature=Z',
+              status=200)
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--device', 'c',
+                            '--output', str(tmp_path), 'export']):
+        cli()
+
+    assert (tmp_path / 'manifest.json').exists()
+
+def test_cli_import_deferred():
+    # Modules only needed for some actions must not slow down the others
+    result = subprocess.run(
+        [sys.executable, '-c',
+         'import sys, owlet_api.cli; print(" ".join(sys.modules))'],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    modules = result.stdout.split()
+
+    assert 'owlet_api.owletapi' in modules
+    for module in ['dateutil', 'sqlite3', 'gzip', 'concurrent.futures']:
+        assert module not in modules
+
+def test_cli_replay(tmp_path, capsys):
+    path = tmp_path / 'capture.jsonl'
+    path.write_text(
+        '{"time":1,"method":"POST","url":"https://user-field.aylanetworks.com/users/sign_in.json",'
+        '"status":200,"text":"{\\"access_token\\":\\"replayed\\",\\"expires_in\\":86400}"}\n')
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--replay', str(path), 'token']):
+        cli()
+
+    assert 'Token: replayed' in capsys.readouterr().out
+
+@responses.activate
+def test_cli_record(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    path = tmp_path / 'capture.jsonl'
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--record', str(path), 'token']):
+        cli()
+
+    assert 'testtoken' in path.read_text()
+
+@responses.activate
+def test_cli_record_transport(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    # The recording goes through the transport asked for
+    path = tmp_path / 'capture.jsonl'
+    with patch('owlet_api.owlettransport.OwletHttp2Session', return_value=requests.Session()) as http2:
+        with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--record', str(path),
+                                '--transport', 'http2', 'token']):
+            cli()
+
+    assert http2.called
+    assert 'testtoken' in path.read_text()
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_deadline(sleep_mock):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--deadline', '3', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    assert responses.calls[-2].request.req_kwargs['timeout'][0] <= 3
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_profile(sleep_mock, tmp_path):
+    sleep_mock.side_effect = [None, SystemExit]
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    path = tmp_path / 'profile.txt'
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--profile', str(path),
+                            '--profile-interval', '0', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    report = path.read_text()
+    for phase in ['http', 'json', 'parse', 'sleep', 'output']:
+        assert phase in report
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_filter(sleep_mock, capsys):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--stream', 'AGE_MONTHS_OLD', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    assert 'names%5B%5D=AGE_MONTHS_OLD' in responses.calls[2].request.url
+    assert capsys.readouterr().out.splitlines()[0] == 'TIMESTAMP;DSN;AGE_MONTHS_OLD;'
+
+@responses.activate
+def test_cli_snapshot(tmp_path, capsys):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+
+    path = str(tmp_path / 'snapshot.json')
+    for number in range(2):
+        with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--snapshot', path, 'devices']):
+            cli()
+
+    # The second run neither logs in nor reads devices.json
+    assert len(responses.calls) == 2
+    assert len(capsys.readouterr().out.splitlines()) == 2
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_overflow(sleep_mock, capsys):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--queue-size', '1',
+                            '--overflow', 'coalesce', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    # Queued output is written before exiting
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith('TIMESTAMP;DSN;')
+    assert lines[-1].split(';')[1] == 'c'
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_batch_reactivate(sleep_mock, capsys):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}], status=207)
+
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    assert responses.calls[-1].request.url.endswith('/batch_datapoints.json')
+    assert capsys.readouterr().out.splitlines()[-1].split(';')[1] == 'c'
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_deadline_overrun(sleep_mock, capsys):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+
+    with freeze_time("2019-01-01 00:00:00") as frozen:
+        def properties(request):
+            # The update takes longer than the deadline
+            frozen.tick(5)
+            return (200, {}, json.dumps(DEVICE_ATTRIBUTES))
+
+        responses.add_callback(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+                               callback=properties)
+
+        with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--deadline', '3', 'stream']):
+            with pytest.raises(SystemExit):
+                cli()
+
+    # Reactivation fails, the update is output anyway
+    assert not any(call.request.url.endswith('/batch_datapoints.json')
+                   for call in responses.calls)
+    assert capsys.readouterr().out.splitlines()[-1].split(';')[1] == 'c'
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_budget(sleep_mock, capsys):
+    sleep_mock.side_effect = SystemExit
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    # Less than one request per minute: nothing is polled
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--budget', '0.01',
+                            '--priority', 'c', 'stream']):
+        with pytest.raises(SystemExit):
+            cli()
+
+    # Only the request for the attributes to stream
+    assert len([call for call in responses.calls
+                if call.request.url.endswith('/properties')]) == 1
+    assert len(capsys.readouterr().out.splitlines()) == 1
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_daemon(sleep_mock, tmp_path):
+    sleep_mock.side_effect = KeyboardInterrupt
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}], status=207)
+
+    path = tmp_path / 'owlet.sock'
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--listen', str(path),
+                            '--snapshot', str(tmp_path / 'snapshot.json'), 'daemon']):
+        cli()
+
+    # Stopped cleanly
+    assert not path.exists()
+    assert (tmp_path / 'snapshot.json').exists()
+
+@responses.activate
+@patch('time.sleep')
+def test_cli_stream_output_failed(sleep_mock, tmp_path, capsys):
+    # Give the output thread time to fail
+    sleep_mock.side_effect = lambda seconds: SLEEP(0.01)
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}], status=207)
+
+    # The output is piped into a program that exited
+    with patch('owlet_api.cli._sink_changes', side_effect=BrokenPipeError(32, 'Broken pipe')):
+        with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--timeout', '10', 'stream']):
+            with pytest.raises(SystemExit) as exit_info:
+                cli()
+
+    assert exit_info.value.code == 1
+    assert 'Output failed' in capsys.readouterr().err
+
+    # The store cannot be opened
+    store = str(tmp_path / 'missing' / 'owlet.db')
+    with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--timeout', '10',
+                            '--store', store, 'stream']):
+        with pytest.raises(SystemExit) as exit_info:
+            cli()
+
+    assert exit_info.value.code == 1
+    assert 'Output failed' in capsys.readouterr().err
+
+@responses.activate
+def test_cli_stream_interrupted(tmp_path, capsys):
+    import threading
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    # Ctrl-C while polling ends the output thread too
+    threads = threading.active_count()
+    path = tmp_path / 'snapshot.json'
+    with patch.object(OwletAPI, 'get_active_devices', side_effect=KeyboardInterrupt):
+        with patch('sys.argv', ['cli.py', 'test@test.de', 'moped', '--snapshot', str(path),
+                                'stream']):
+            with pytest.raises(KeyboardInterrupt):
+                cli()
+
+    assert threading.active_count() == threads
+    assert path.exists()
+    assert capsys.readouterr().out.startswith('TIMESTAMP;DSN;')
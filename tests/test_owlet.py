@@ -446,7 +446,31 @@ def test_download_logged_data_ok():
     device.update()
 
     device.download_logged_data()
-    
+
+
+@responses.activate
+def test_download_logged_data_raw():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'http://de.mo/file',
+              json=DOWNLOAD_DATA, status=200)
+    responses.add(responses.GET, 'https://ayla-device-field-production-1a2039d9.s3.amazonaws.com/X?AWSAccessKeyId=Y&Expires=1234&Signature=Z',
+              body=b'\x8e\xff\x00', status=200)
+
+    # Initialize OwletAPI
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    # Instantiate the device
+    device = Owlet(api, DEVICE_PAYLOAD)
+
+    # Update the decice
+    device.update()
+
+    assert device.download_logged_data(raw=True) == b'\x8e\xff\x00'
+
 
 @responses.activate
 def test_download_logged_data_fail_noinit():
@@ -643,3 +667,296 @@ def test_download_logged_data_fail_nodownloadcode():
         device.download_logged_data()
     
     assert 'Download Request failed - status code' in str(info.value)
+
+def test_property_timestamp_formats():
+    from owlet_api.owletproperty import parse_timestamp
+
+    fast = parse_timestamp('2018-12-30T09:43:23Z')
+    slow = parse_timestamp('2018-12-30T09:43:23.5+00:00')
+
+    assert str(fast) == '2018-12-30 09:43:23+00:00'
+    assert (slow - fast).total_seconds() == 0.5
+
+def test_property_decode():
+    from owlet_api.owletproperty import OwletProperty
+
+    attributes = copy.deepcopy(DEVICE_ATTRIBUTES[0]['property'])
+    attributes['value'] = '97'
+    assert OwletProperty(attributes).value == 97
+
+    attributes['base_type'] = 'decimal'
+    attributes['value'] = '1.5'
+    assert OwletProperty(attributes).value == 1.5
+
+    attributes['base_type'] = 'boolean'
+    attributes['value'] = True
+    assert OwletProperty(attributes).value == 1
+
+    # Values not matching their base_type are kept as they are
+    attributes['value'] = 'http://de.mo/file'
+    assert OwletProperty(attributes).value == 'http://de.mo/file'
+
+    attributes['base_type'] = 'string'
+    attributes['value'] = '20190115'
+    assert OwletProperty(attributes).value == '20190115'
+
+
+def test_property_shared_metadata():
+    from owlet_api.owletproperty import OwletProperty
+
+    attributes = copy.deepcopy(DEVICE_ATTRIBUTES[0]['property'])
+    first = OwletProperty(attributes)
+
+    # Equal, but distinct string objects as from a second JSON document
+    attributes['name'] = ''.join(['AGE_', 'MONTHS_OLD'])
+    attributes['display_name'] = ''.join(['Age ', '(Months)'])
+    assert attributes['name'] is not first.name
+    second = OwletProperty(attributes)
+
+    assert first.name == 'AGE_MONTHS_OLD'
+    assert first.base_type == 'integer'
+    assert first.name is second.name
+    assert first.display_name is second.display_name
+
+@responses.activate
+def test_update_changes():
+    my_device_attributes = copy.deepcopy(DEVICE_ATTRIBUTES)
+    my_device_attributes[0]['property']['value'] = 'DEADBEEF'
+    my_device_attributes[1]['property']['data_updated_at'] = '2018-12-30T09:43:28Z'
+
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=my_device_attributes, status=200)
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+
+    # Everything is new, then nothing changed, then value and timestamp
+    assert device.update() == ['AGE_MONTHS_OLD', 'ALRTS_DISABLED',
+                               'APP_ACTIVE', 'LOGGED_DATA_CACHE']
+    assert device.update() == []
+    assert device.update() == ['AGE_MONTHS_OLD', 'ALRTS_DISABLED']
+
+@responses.activate
+def test_update_single_flight():
+    import json
+    import threading
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_properties(request):
+        started.set()
+        release.wait(10)
+        return (200, {}, json.dumps(DEVICE_ATTRIBUTES))
+
+    responses.add_callback(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              callback=slow_properties)
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(device.update()))
+               for number in range(5)]
+
+    threads[0].start()
+    assert started.wait(10)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    # One request, every caller sees its changes
+    assert len(responses.calls) == 2
+    assert len(results) == 5
+    assert all(result == results[0] for result in results)
+    assert 'APP_ACTIVE' in results[0]
+
+@responses.activate
+def test_update_single_flight_error():
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              body=requests.exceptions.ConnectionError())
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+    device.set_freshness(60)
+
+    # Failed updates do not start the freshness window
+    for number in range(2):
+        with pytest.raises(OwletTemporaryCommunicationException):
+            device.update()
+    assert device._flight is None
+
+@responses.activate
+def test_update_freshness():
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+    device.set_freshness(5)
+
+    with freeze_time("2019-01-01 00:00:00"):
+        assert device.update() != []
+        assert device.update() == []
+    with freeze_time("2019-01-01 00:00:04"):
+        assert device.update() == []
+    assert len(responses.calls) == 2
+
+    with freeze_time("2019-01-01 00:00:05"):
+        device.update()
+    assert len(responses.calls) == 3
+    assert device.get_property('APP_ACTIVE').value == 0
+
+def test_property_update_interval():
+    from datetime import datetime, timedelta
+    from owlet_api.owletproperty import OwletProperty, estimate_interval
+
+    assert estimate_interval([10, 10, 1, 10, 86400]) == 10
+    assert estimate_interval([4, 6]) == 5
+
+    attributes = copy.deepcopy(DEVICE_ATTRIBUTES[0]['property'])
+    myproperty = OwletProperty(attributes)
+    assert myproperty.update_interval is None
+
+    start = datetime(2018, 12, 30, 9, 43, 23)
+    # Regular cadence of 10 seconds with one burst and one long gap
+    for offset in [10, 20, 21, 31, 41, 86441, 86451, 86461]:
+        attributes['data_updated_at'] = \
+            (start + timedelta(seconds=offset)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        myproperty.update(attributes)
+
+    assert myproperty.update_interval == 10
+
+    # Gaps longer than a day are not mistaken for short ones
+    attributes['data_updated_at'] = '2019-01-10T09:43:24Z'
+    other = OwletProperty(attributes)
+    attributes['data_updated_at'] = '2019-01-12T09:43:24Z'
+    other.update(attributes)
+    assert other.update_interval == 172800
+
+@responses.activate
+def test_update_interval_recovers():
+    # A burst does not pin the device to a fast poll rate
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    for timestamp in ['09:43:23', '09:43:24', '09:43:29', '09:43:34', '09:43:39']:
+        my_device_attributes = copy.deepcopy(DEVICE_ATTRIBUTES)
+        my_device_attributes[0]['property']['data_updated_at'] = \
+            '2018-12-30T%sZ' % timestamp
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+                  json=my_device_attributes, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+
+    device.update()
+    device.update()
+    assert device.get_update_interval() == 1
+
+    device.update()
+    device.update()
+    device.update()
+    assert device.get_update_interval() == 5
+
+@responses.activate
+def test_update_interval_rare_burst():
+    # A property that changes twice in a row and never again does not
+    # pin the device to a fast poll rate
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    for second in range(0, 60, 5):
+        my_device_attributes = copy.deepcopy(DEVICE_ATTRIBUTES)
+        my_device_attributes[0]['property']['data_updated_at'] = \
+            '2018-12-30T09:44:%02dZ' % second
+        my_device_attributes[1]['property']['data_updated_at'] = \
+            '2018-12-30T09:44:%02dZ' % min(second, 1)
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+                  json=my_device_attributes, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+
+    for _ in range(12):
+        device.update()
+
+    assert device.get_property('ALRTS_DISABLED').update_interval == 1
+    assert device.get_update_interval() == 5
+
+@responses.activate
+def test_update_property_filter():
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+    device.set_property_filter(['AGE_MONTHS_OLD'])
+
+    # Properties the server sends anyway are not parsed
+    assert device.update() == ['AGE_MONTHS_OLD', 'APP_ACTIVE']
+    assert sorted(device.get_properties()) == ['AGE_MONTHS_OLD', 'APP_ACTIVE']
+    assert responses.calls[-1].request.url.endswith(
+        '/properties?names%5B%5D=AGE_MONTHS_OLD&names%5B%5D=APP_ACTIVE'
+        '&names%5B%5D=BASE_STATION_ON')
+
+    device.set_property_filter(None)
+    assert device.get_property_filter() is None
+    assert device.update() == ['ALRTS_DISABLED', 'LOGGED_DATA_CACHE']
+    assert responses.calls[-1].request.url.endswith('/properties')
+
+@responses.activate
+def test_is_online_property_filter():
+    my_device_attributes = copy.deepcopy(DEVICE_ATTRIBUTES)
+    my_device_attributes[1]['property']['name'] = 'BASE_STATION_ON'
+    my_device_attributes[1]['property']['value'] = 0
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=my_device_attributes, status=200)
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+    device.set_property_filter(['AGE_MONTHS_OLD'])
+
+    # A streamed attribute does not hide the base station being off
+    device.update()
+    assert not device.is_online()
+
+def test_is_online():
+    device = Owlet(Mock(), DEVICE_PAYLOAD)
+    assert device.is_online()
+
+    device.connection_status = 'Offline'
+    assert not device.is_online()
+
+    from owlet_api.owletproperty import OwletProperty
+    attributes = copy.deepcopy(DEVICE_ATTRIBUTES[0]['property'])
+    attributes['name'] = 'BASE_STATION_ON'
+    attributes['value'] = 0
+    device.properties['BASE_STATION_ON'] = OwletProperty(attributes)
+    device.connection_status = 'Online'
+    assert not device.is_online()
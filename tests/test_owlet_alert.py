@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+import pytest
+import responses
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletalert import OwletRule, OwletAlertEngine, OwletAlert
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'OXYGEN_LEVEL',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738121,
+            'display_name':'Oxygen Level',
+            'value':85
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def test_rule():
+    rule = OwletRule('low oxygen', 'OXYGEN_LEVEL', '<', 90, clear=92)
+
+    assert rule.test(89)
+    assert not rule.test(90)
+    assert rule.test(91, active=True)
+    assert not rule.test(92, active=True)
+    assert not rule.test(None)
+
+    rule = OwletRule('heart rate', 'HEART_RATE', 'outside', (90, 180))
+    assert rule.test(80) and rule.test(190) and not rule.test(130)
+
+    with pytest.raises(ValueError):
+        OwletRule('x', 'HEART_RATE', '~', 1)
+
+
+def test_engine_debounce():
+    engine = OwletAlertEngine(
+        [OwletRule('low oxygen', 'OXYGEN_LEVEL', '<', 90, duration=10)])
+
+    assert engine.process('c', 'OXYGEN_LEVEL', 85, 100) == []
+    assert engine.process('c', 'OXYGEN_LEVEL', 86, 105) == []
+    assert engine.process('c', 'OXYGEN_LEVEL', 85, 110) == [
+        OwletAlert('low oxygen', 'c', 'OXYGEN_LEVEL', 'raised', 85, 110)]
+    # Raised only once
+    assert engine.process('c', 'OXYGEN_LEVEL', 84, 115) == []
+    assert engine.get_active() == [('low oxygen', 'c')]
+
+    # A short dip does not raise
+    assert engine.process('d', 'OXYGEN_LEVEL', 85, 100) == []
+    assert engine.process('d', 'OXYGEN_LEVEL', 95, 105) == []
+    assert engine.process('d', 'OXYGEN_LEVEL', 85, 112) == []
+    assert engine.get_active('d') == []
+
+
+def test_engine_hysteresis():
+    engine = OwletAlertEngine(
+        [OwletRule('low oxygen', 'OXYGEN_LEVEL', '<', 90, clear=92)])
+
+    assert engine.process('c', 'OXYGEN_LEVEL', 89, 100)[0].state == 'raised'
+    assert engine.process('c', 'OXYGEN_LEVEL', 91, 101) == []
+    assert engine.process('c', 'OXYGEN_LEVEL', 89, 102) == []
+    assert engine.process('c', 'OXYGEN_LEVEL', 92, 103) == [
+        OwletAlert('low oxygen', 'c', 'OXYGEN_LEVEL', 'cleared', 92, 103)]
+    assert engine.get_active() == []
+
+
+def test_engine_tick():
+    engine = OwletAlertEngine(
+        [OwletRule('sock off', 'SOCK_REC_PLACED', '==', 0, duration=30)])
+
+    assert engine.process('c', 'SOCK_REC_PLACED', 0, 100) == []
+    assert engine.tick(now=120) == []
+    assert engine.tick(now=130) == [
+        OwletAlert('sock off', 'c', 'SOCK_REC_PLACED', 'raised', 0, 130)]
+    assert engine.tick(now=140) == []
+
+
+def test_engine_rules():
+    engine = OwletAlertEngine()
+    engine.add_rule(OwletRule('battery', 'BATT_LEVEL', '<', 20))
+    engine.add_rule(OwletRule('heart rate', 'HEART_RATE', 'outside',
+                              (90, 180)))
+
+    # Only rules of the changed property are evaluated
+    assert engine.process('c', 'OXYGEN_LEVEL', 10, 100) == []
+    assert engine.process('c', 'BATT_LEVEL', 10, 100)[0].rule == 'battery'
+
+    engine.add_rule(OwletRule('battery', 'BATT_LEVEL', '<', 5))
+    assert engine.get_active() == []
+    assert engine.process('c', 'BATT_LEVEL', 10, 101) == []
+
+    engine.remove_rule('battery')
+    assert engine.process('c', 'BATT_LEVEL', 1, 102) == []
+
+
+@responses.activate
+def test_engine_update():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE_PAYLOAD}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = api.get_devices()[0]
+
+    engine = OwletAlertEngine([
+        OwletRule('low oxygen', 'OXYGEN_LEVEL', '<', 90),
+        OwletRule('heart rate', 'HEART_RATE', 'outside', (90, 180))])
+
+    assert engine.process_update(device, device.update()) == [
+        OwletAlert('low oxygen', 'c', 'OXYGEN_LEVEL', 'raised', 85,
+                   1546163003.0)]
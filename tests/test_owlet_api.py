@@ -5,6 +5,7 @@ import requests
 import pytest
 import time
 import copy
+import json
 from unittest.mock import Mock, patch
 from freezegun import freeze_time
 
@@ -299,6 +300,31 @@ def test_update_devices_fail_invalidjson():
         
     assert 'Server did not send valid json' in str(info.value)
 
+@responses.activate
+def test_update_devices_property_filter():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    more_devices = copy.deepcopy(DEVICES_PAYLOAD) + copy.deepcopy(DEVICES_PAYLOAD)
+    more_devices[1]['device']['dsn'] = 'd'
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=more_devices, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    api.set_property_filter(['HEART_RATE'])
+    api.update_devices()
+
+    # Devices listed later are filtered too
+    api.update_devices()
+    assert [device.dsn for device in api.get_devices()] == ['c', 'd']
+    for device in api.get_devices():
+        assert device.get_property_filter() == {'HEART_RATE', 'APP_ACTIVE', 'BASE_STATION_ON'}
+
+    api.set_property_filter(None)
+    assert api.get_devices()[1].get_property_filter() is None
+
 def test_update_devices_fail_noinit():
     api = OwletAPI()
 
@@ -323,3 +349,391 @@ def test_get_devices_ok():
     api.get_devices()
  
     assert api.get_update_interval() == 177
+
+@responses.activate
+def test_update_devices_keeps_devices():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI()
+    api.set_email("test@test.de")
+    api.set_password("moped")
+    api.login()
+
+    devices_payload = copy.deepcopy(DEVICES_PAYLOAD)
+    devices_payload[0]['device']['connection_status'] = 'Offline'
+    other_device = copy.deepcopy(DEVICES_PAYLOAD[0])
+    other_device['device']['dsn'] = 'd'
+    devices_payload.append(other_device)
+
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json', json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json', json=devices_payload, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json', json=[], status=200)
+
+    device = api.update_devices()[0]
+    device.update_interval = 3
+
+    devices = api.update_devices()
+    assert devices[0] is device
+    assert device.update_interval == 3
+    assert device.connection_status == 'Offline'
+    assert devices[1].dsn == 'd'
+
+    assert api.update_devices() == []
+
+@responses.activate
+def test_timeouts():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              body=requests.exceptions.ReadTimeout('too slow'))
+
+    api = OwletAPI("test@test.de", "moped")
+    api.set_timeout('login', 2, 7)
+    api.set_timeout('devices', 3)
+    api.login()
+
+    assert responses.calls[0].request.req_kwargs['timeout'] == (2, 7)
+    assert api.get_timeout('devices') == (3, 3)
+    assert api.get_timeout('file') == (5, 60)
+
+    with pytest.raises(OwletTemporaryCommunicationException):
+        api.update_devices()
+
+    assert responses.calls[1].request.req_kwargs['timeout'] == (3, 3)
+    assert api.get_metrics()['timeouts'] == 1
+
+
+def test_deadline():
+    api = OwletAPI()
+
+    with freeze_time("2018-12-30 10:00:00"):
+        api.set_deadline(time.time() + 2)
+        assert api.get_timeout('file') == (2, 2)
+        assert api.get_timeout('login') == (2, 2)
+
+    with freeze_time("2018-12-30 10:00:03"):
+        with pytest.raises(OwletTemporaryCommunicationException) as info:
+            api.get_timeout('login')
+
+        assert 'Deadline exceeded' in str(info.value)
+        assert api.get_metrics()['deadline_overruns'] == 1
+
+        api.set_deadline(None)
+        assert api.get_timeout('login') == (5, 5)
+
+
+@responses.activate
+def test_update_all():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    devices_payload = copy.deepcopy(DEVICES_PAYLOAD)
+    other_device = copy.deepcopy(DEVICES_PAYLOAD[0])
+    other_device['device']['dsn'] = 'd'
+    devices_payload.append(other_device)
+
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json', json=devices_payload, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties', json=[], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/d/properties', json=[], status=500)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    api.update_devices()
+
+    assert [device.dsn for device in api.update_all()] == ['c']
+
+    # Past the deadline, all devices are skipped
+    assert api.update_all(deadline=time.time() - 1) == []
+    assert api.get_metrics()['deadline_skipped_devices'] == 2
+    assert api.get_timeout('properties') == (5, 5)
+
+@responses.activate
+def test_transfer_stats():
+    import gzip
+    import json
+
+    devices = json.dumps(DEVICES_PAYLOAD).encode('utf-8')
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              body=gzip.compress(devices), status=200,
+              headers={'Content-Encoding': 'gzip'})
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    assert 'gzip' in responses.calls[-1].request.headers['Accept-Encoding']
+    assert api.get_devices()[0].dsn == 'c'
+
+    stats = api.get_transfer_stats()
+    assert stats['devices'] == {'requests': 1,
+                                'compressed_bytes': len(gzip.compress(devices)),
+                                'uncompressed_bytes': len(devices)}
+    assert stats['devices']['compressed_bytes'] < len(devices)
+    assert stats['login']['requests'] == 1
+
+@responses.activate
+def test_active_devices():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    devices_payload = copy.deepcopy(DEVICES_PAYLOAD)
+    devices_payload[0]['device']['connection_status'] = 'Online'
+    offline_device = copy.deepcopy(DEVICES_PAYLOAD[0])
+    offline_device['device']['dsn'] = 'd'
+    offline_device['device']['connection_status'] = 'Offline'
+    devices_payload.append(offline_device)
+    online_again = copy.deepcopy(devices_payload)
+    online_again[1]['device']['connection_status'] = 'Online'
+
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=devices_payload, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=online_again, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    def active():
+        return [device.dsn for device in api.get_active_devices()]
+
+    # The offline device is probed after 10, 20, 40, ... seconds
+    with freeze_time("2019-01-01 00:00:00"):
+        assert active() == ['c']
+    with freeze_time("2019-01-01 00:00:09"):
+        assert active() == ['c']
+    with freeze_time("2019-01-01 00:00:10"):
+        assert active() == ['c', 'd']
+        assert active() == ['c']
+    with freeze_time("2019-01-01 00:00:29"):
+        assert active() == ['c']
+    with freeze_time("2019-01-01 00:00:30"):
+        assert active() == ['c', 'd']
+    with freeze_time("2019-01-01 00:01:09"):
+        assert active() == ['c']
+
+    # Refreshed devices.json tells it is back
+    assert len(responses.calls) == 2
+    with freeze_time("2019-01-01 00:05:00"):
+        assert active() == ['c', 'd']
+    assert len(responses.calls) == 3
+
+@responses.activate
+def test_active_devices_failing():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              status=500)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=[], status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    with freeze_time("2019-01-01 00:00:00"):
+        device = api.get_active_devices()[0]
+        with pytest.raises(OwletTemporaryCommunicationException):
+            device.update()
+        assert api.get_active_devices() == []
+
+    with freeze_time("2019-01-01 00:00:10"):
+        assert api.get_active_devices() == [device]
+        device.update()
+        assert api.get_active_devices() == [device]
+
+@responses.activate
+def test_snapshot(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    for timestamp in ['09:43:23', '09:43:26', '09:43:29']:
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+                  json=[{'property': {
+                      'type': 'Property',
+                      'name': 'HEART_RATE',
+                      'base_type': 'integer',
+                      'data_updated_at': '2018-12-30T%sZ' % timestamp,
+                      'key': 42738120,
+                      'display_name': 'Heart Rate',
+                      'value': 130}}], status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = api.get_devices()[0]
+    for number in range(3):
+        device.update()
+    assert device.get_update_interval() == 3
+
+    path = str(tmp_path / 'snapshot.json')
+    api.save_snapshot(path)
+    calls = len(responses.calls)
+
+    restored = OwletAPI("test@test.de", "moped")
+    assert restored.load_snapshot(path)
+
+    # Warm: no login, no devices.json, learned interval kept
+    assert restored.get_auth_token() == 'testtoken'
+    restored_device = restored.get_devices()[0]
+    assert restored_device.dsn == 'c'
+    assert restored_device.lat == device.lat
+    assert restored_device.get_update_interval() == 3
+    heart_rate = restored_device.get_property('HEART_RATE')
+    assert heart_rate.value == 130
+    assert heart_rate.last_update == device.get_property('HEART_RATE').last_update
+    assert heart_rate.get_intervals() == [3.0, 3.0]
+    assert restored.get_health_index().get_last_data('c') == heart_rate.timestamp()
+    assert len(responses.calls) == calls
+
+    # Only our own, valid snapshots are used
+    assert not OwletAPI("other@test.de", "moped").load_snapshot(path)
+    assert not OwletAPI().load_snapshot(str(tmp_path / 'missing.json'))
+    (tmp_path / 'broken.json').write_text('{')
+    assert not OwletAPI().load_snapshot(str(tmp_path / 'broken.json'))
+
+@responses.activate
+def test_snapshot_expired(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    path = str(tmp_path / 'snapshot.json')
+    with freeze_time("2019-01-01 00:00:00"):
+        api = OwletAPI("test@test.de", "moped")
+        api.login()
+        api.save_snapshot(path)
+
+    with freeze_time("2019-01-03 00:00:00"):
+        restored = OwletAPI("test@test.de", "moped")
+        assert restored.load_snapshot(path)
+        assert restored.get_auth_token() == 'testtoken'
+
+    # The expired token was renewed
+    assert len(responses.calls) == 2
+
+@responses.activate
+def test_snapshot_invalid(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    devices = api.get_devices()
+    path = tmp_path / 'snapshot.json'
+    api.save_snapshot(str(path))
+    saved = json.loads(path.read_text())
+
+    health = api.get_health_index()
+    fleet = api.get_fleet_table()
+
+    broken = [copy.deepcopy(saved) for number in range(4)]
+    del broken[0]['backoff']
+    broken[1]['failing'] = None
+    del broken[2]['devices'][0]['device']['mac']
+    broken[3]['devices'][0]['properties'] = [{'name': 'HEART_RATE'}]
+
+    for snapshot in broken:
+        snapshot['auth_token'] = 'othertoken'
+        path.write_text(json.dumps(snapshot))
+
+        # Nothing is restored from a snapshot that is only partly usable
+        assert not api.load_snapshot(str(path))
+        assert api.get_auth_token() == 'testtoken'
+        assert api.get_devices() == devices
+        assert api.get_health_index() is health
+        assert api.get_fleet_table() is fleet
+
+APP_ACTIVE_ATTRIBUTES = [{'property': {
+    'type': 'Property',
+    'name': 'APP_ACTIVE',
+    'base_type': 'boolean',
+    'data_updated_at': '2018-12-30T09:43:23Z',
+    'key': 42738119,
+    'display_name': 'App Active',
+    'value': 0}}]
+
+
+def batch_devices(api, count):
+    devices = []
+    for number in range(count):
+        device_payload = copy.deepcopy(DEVICES_PAYLOAD[0]['device'])
+        device_payload['dsn'] = 'dsn%d' % number
+        device = Owlet(api, device_payload)
+        device._update_properties(APP_ACTIVE_ATTRIBUTES)
+        devices.append(device)
+    return devices
+
+@responses.activate
+def test_batch_datapoints():
+    import json
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}, {'status': 422}], status=207)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              status=201)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    api.datapoint_batch_size = 2
+    devices = batch_devices(api, 3)
+
+    api.queue_datapoint(devices[0], 'BABY_NAME', 'Little Baby')
+    assert api.reactivate_all(devices) == [
+        ('dsn0', 'BABY_NAME', True),
+        ('dsn0', 'APP_ACTIVE', False),
+        ('dsn1', 'APP_ACTIVE', True),
+        ('dsn2', 'APP_ACTIVE', True)]
+
+    # Two requests for four datapoints
+    assert len(responses.calls) == 3
+    assert json.loads(responses.calls[1].request.body) == {'batch_datapoints': [
+        {'dsn': 'dsn0', 'name': 'BABY_NAME', 'datapoint': {'value': 'Little Baby'}},
+        {'dsn': 'dsn0', 'name': 'APP_ACTIVE', 'datapoint': {'value': 1}}]}
+    assert api.flush_datapoints() == []
+
+@responses.activate
+def test_batch_datapoints_error():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              body=requests.exceptions.ConnectionError())
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    devices = batch_devices(api, 2)
+
+    # A failed batch is not written one by one
+    assert api.reactivate_all(devices) == [
+        ('dsn0', 'APP_ACTIVE', False), ('dsn1', 'APP_ACTIVE', False)]
+    assert len(responses.calls) == 2
+
+@responses.activate
+def test_batch_datapoints_fallback():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              status=404)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/properties/42738119/datapoints',
+              status=201)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    devices = batch_devices(api, 2)
+
+    # Without batch endpoint, datapoints are written one by one
+    assert api.reactivate_all(devices) == [
+        ('dsn0', 'APP_ACTIVE', True), ('dsn1', 'APP_ACTIVE', True)]
+    assert len(responses.calls) == 4
+
+    # Unknown properties can only be written in batches
+    api.queue_datapoint(devices[0], 'BABY_NAME', 'Little Baby')
+    assert api.reactivate_all(devices[1:]) == [
+        ('dsn0', 'BABY_NAME', False), ('dsn1', 'APP_ACTIVE', True)]
+    assert len(responses.calls) == 5
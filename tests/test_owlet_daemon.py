@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import responses
+from unittest.mock import patch
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletdaemon import OwletChangeLog, OwletDaemon
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'OXYGEN_LEVEL',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738121,
+            'display_name':'Oxygen Level',
+            'value':85
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def logged_in_api():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE_PAYLOAD}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}], status=207)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    return api
+
+
+def wait_for_devices(daemon):
+    for number in range(100):
+        if daemon.get_devices():
+            return
+        time.sleep(0.05)
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_change_log():
+    log = OwletChangeLog(maxlen=2)
+    log.append('c', 'HEART_RATE', 1.0, 130)
+    log.append('c', 'OXYGEN_LEVEL', 1.0, 98)
+    log.append('c', 'HEART_RATE', 2.0, 131)
+
+    # Only the last 2 changes are kept
+    sequence, changes = log.since(0)
+    assert sequence == 3
+    assert [change['seq'] for change in changes] == [2, 3]
+    assert changes[1] == {'seq': 3, 'dsn': 'c', 'name': 'HEART_RATE',
+                          'timestamp': 2.0, 'value': 131}
+
+    assert log.since(3, timeout=0.01) == (3, [])
+
+    # Sequence numbers of a previous daemon
+    assert [change['seq'] for change in log.since(100)[1]] == [2, 3]
+
+
+def test_change_log_wait():
+    log = OwletChangeLog()
+    timer = threading.Timer(0.1, log.append, ('c', 'HEART_RATE', 1.0, 130))
+    timer.start()
+
+    start = time.time()
+    sequence, changes = log.since(0, timeout=10)
+    assert time.time() - start < 5
+    assert sequence == 1 and changes[0]['value'] == 130
+    timer.join()
+
+
+@responses.activate
+def test_daemon_http():
+    api = logged_in_api()
+    daemon = OwletDaemon([api], '127.0.0.1:0')
+    daemon.start()
+
+    try:
+        wait_for_devices(daemon)
+        url = 'http://127.0.0.1:%d' % daemon.get_address()[1]
+
+        status, devices = get(url + '/devices')
+        assert status == 200
+        assert [device['dsn'] for device in devices] == ['c']
+        assert devices[0]['properties']['HEART_RATE']['value'] == 130
+
+        status, device = get(url + '/devices/c')
+        assert status == 200 and device['connection_status'] == 'k'
+
+        assert get(url + '/devices/unknown')[0] == 404
+        assert get(url + '/unknown')[0] == 404
+        assert get(url + '/changes?since=x')[0] == 400
+
+        status, changes = get(url + '/changes?since=0')
+        assert status == 200
+        assert sorted(change['name'] for change in changes['changes']) == \
+            ['HEART_RATE', 'OXYGEN_LEVEL']
+
+        # Nothing new
+        status, changes = get(url + '/changes?since=%d&timeout=0.01' % changes['seq'])
+        assert changes['changes'] == []
+    finally:
+        daemon.stop()
+
+    # Devices were reactivated in a batch
+    assert any(call.request.url.endswith('/batch_datapoints.json')
+               for call in responses.calls)
+
+
+@responses.activate
+def test_daemon_poll_error(capsys):
+    api = logged_in_api()
+    get_active_devices = api.get_active_devices
+    # The first cycle fails with an unexpected payload
+    errors = [KeyError('dsn')]
+
+    def poll_devices():
+        if errors:
+            raise errors.pop()
+        return get_active_devices()
+
+    with patch.object(api, 'get_active_devices', side_effect=poll_devices), \
+            patch.object(api, 'get_update_interval', return_value=0.05):
+        daemon = OwletDaemon([api], '127.0.0.1:0')
+        daemon.start()
+
+        try:
+            wait_for_devices(daemon)
+        finally:
+            daemon.stop()
+
+    # Polling went on after the error
+    assert list(daemon.get_devices()) == ['c']
+    assert 'KeyError' in capsys.readouterr().err
+
+
+@responses.activate
+def test_daemon_unix_socket(tmp_path):
+    api = logged_in_api()
+    path = str(tmp_path / 'owlet.sock')
+    daemon = OwletDaemon([api], path)
+    daemon.start()
+
+    try:
+        wait_for_devices(daemon)
+
+        connection = UnixHTTPConnection(path)
+        connection.request('GET', '/devices/c')
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())['dsn'] == 'c'
+        connection.close()
+    finally:
+        daemon.stop()
+
+    assert not (tmp_path / 'owlet.sock').exists()
+
+
+@responses.activate
+def test_daemon_unix_socket_names(tmp_path, monkeypatch):
+    api = logged_in_api()
+    monkeypatch.chdir(tmp_path)
+
+    # A relative path, and a path that looks like host:port
+    for listen, path in [('owlet.sock', 'owlet.sock'),
+                         ('unix:localhost:8750', 'localhost:8750')]:
+        daemon = OwletDaemon([api], listen)
+        daemon.start()
+
+        try:
+            assert daemon.get_address() == path
+            assert (tmp_path / path).exists()
+        finally:
+            daemon.stop()
+
+        assert not (tmp_path / path).exists()
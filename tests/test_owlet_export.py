@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+
+import responses
+import gzip
+import json
+import os
+import copy
+from unittest.mock import patch
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletexport import OwletExporter
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'LOGGED_DATA_CACHE',
+            'base_type':'file',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738119,
+            'display_name':'Logged Data Cache',
+            'value':'http://de.mo/file'
+        }
+    }
+]
+
+DOWNLOAD_DATA = {
+   'datapoint':{
+      'file':'https://ayla-device-field-production-1a2039d9.s3.amazonaws.com/X'
+   }
+}
+
+
+def add_responses(devices):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=devices, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/d/properties',
+              json=[], status=200)
+    responses.add(responses.GET, 'http://de.mo/file',
+              json=DOWNLOAD_DATA, status=200)
+    responses.add(responses.GET, 'https://ayla-device-field-production-1a2039d9.s3.amazonaws.com/X',
+              body=b'\x8e\xff\x00', status=200)
+
+
+@responses.activate
+def test_export(tmp_path):
+    other_device = copy.deepcopy(DEVICE)
+    other_device['dsn'] = 'd'
+    add_responses([{'device': DEVICE}, {'device': other_device}])
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    directory = str(tmp_path / 'export')
+    exporter = OwletExporter(directory, max_workers=2)
+
+    assert exporter.export([api]) == {'c': 'downloaded', 'd': 'failed'}
+
+    with open(os.path.join(directory, 'manifest.json')) as manifest:
+        manifest = json.load(manifest)
+
+    assert list(manifest.keys()) == ['c']
+    assert manifest['c']['url'] == 'http://de.mo/file'
+
+    with gzip.open(os.path.join(directory, manifest['c']['file'])) as logfile:
+        assert logfile.read() == b'\x8e\xff\x00'
+
+    # A second run resumes from the manifest
+    exporter = OwletExporter(directory)
+    assert exporter.export([api], dsns=['c']) == {'c': 'skipped'}
+
+    # Missing output files are fetched again
+    os.remove(os.path.join(directory, manifest['c']['file']))
+    assert exporter.export([api], dsns=['c']) == {'c': 'downloaded'}
+
+
+@responses.activate
+def test_export_manifest_batches(tmp_path):
+    add_responses([{'device': DEVICE}])
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    directory = str(tmp_path / 'export')
+    exporter = OwletExporter(directory)
+    exporter.manifest_batch = 1000
+    exporter.manifest_interval = 1000
+
+    with patch.object(exporter, '_save_manifest',
+                      wraps=exporter._save_manifest) as save_mock:
+        assert exporter.export([api]) == {'c': 'downloaded'}
+
+    # Written once at the end, not per device
+    assert save_mock.call_count == 1
+    with open(os.path.join(directory, 'manifest.json')) as manifest:
+        assert list(json.load(manifest).keys()) == ['c']
+
+
+@responses.activate
+def test_export_write_error(tmp_path):
+    add_responses([{'device': DEVICE}])
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+
+    directory = str(tmp_path / 'export')
+    exporter = OwletExporter(directory)
+
+    with patch('gzip.open', side_effect=OSError('disk full')):
+        assert exporter.export([api]) == {'c': 'failed'}
+
+    assert not os.path.exists(os.path.join(directory, 'manifest.json'))
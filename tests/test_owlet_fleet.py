@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+import copy
+import math
+import pytest
+import responses
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletfleet import OwletFleetTable
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'APP_ACTIVE',
+            'base_type':'boolean',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738119,
+            'display_name':'App Active',
+            'value':0
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def test_fleet_table_set():
+    table = OwletFleetTable()
+
+    table.set('c', 'HEART_RATE', 130, 1546162403.0)
+    table.set('d', 'HEART_RATE', 120)
+    table.set('d', 'OXYGEN_LEVEL', 98)
+    # Strings do not get a column
+    table.set('d', 'LOGGED_DATA_CACHE', 'https://example.com')
+
+    assert len(table) == 2
+    assert table.get_dsns() == ['c', 'd']
+    assert table.get_columns() == ['HEART_RATE', 'OXYGEN_LEVEL']
+    assert table.get_row('c') == {'HEART_RATE': 130.0}
+    assert table.get_row('d') == {'HEART_RATE': 120.0, 'OXYGEN_LEVEL': 98.0}
+    assert table.get_column('HEART_RATE').tolist() == [130.0, 120.0]
+    timestamps = table.get_column('HEART_RATE', timestamps=True).tolist()
+    assert timestamps[0] == 1546162403.0 and math.isnan(timestamps[1])
+
+    oxygen = table.get_column('OXYGEN_LEVEL').tolist()
+    assert math.isnan(oxygen[0]) and oxygen[1] == 98.0
+
+    dsns, columns = table.snapshot(['HEART_RATE', 'MOVEMENT'])
+    assert dsns == ['c', 'd']
+    assert columns['HEART_RATE'].tolist() == [130.0, 120.0]
+    assert all(math.isnan(value) for value in columns['MOVEMENT'])
+
+
+def test_fleet_table_views():
+    table = OwletFleetTable()
+    table.set('c', 'HEART_RATE', 130)
+
+    view = table.get_column('HEART_RATE')
+    table.set('c', 'HEART_RATE', 131)
+    assert view.tolist() == [131.0]
+
+    # Growing does not invalidate views
+    for number in range(100):
+        table.set('dsn%d' % number, 'HEART_RATE', number)
+    assert view.tolist() == [131.0]
+    assert len(table.get_column('HEART_RATE')) == 101
+
+
+def test_fleet_table_remove():
+    table = OwletFleetTable()
+    for dsn, heart_rate in [('c', 130), ('d', 120), ('e', 110)]:
+        table.set(dsn, 'HEART_RATE', heart_rate)
+
+    # The last row takes the place of the removed one
+    table.remove('c')
+    table.remove('unknown')
+    assert table.get_dsns() == ['e', 'd']
+    assert table.get_column('HEART_RATE').tolist() == [110.0, 120.0]
+    assert table.get_row('e') == {'HEART_RATE': 110.0}
+
+    table.remove('d')
+    table.remove('e')
+    assert len(table) == 0
+    table.set('c', 'OXYGEN_LEVEL', 97)
+    assert table.get_row('c') == {'OXYGEN_LEVEL': 97.0}
+
+
+def test_fleet_table_numpy():
+    numpy = pytest.importorskip('numpy')
+    table = OwletFleetTable()
+    table.set('c', 'HEART_RATE', 130)
+    table.set('d', 'HEART_RATE', 120)
+
+    columns = table.to_numpy(['HEART_RATE'])
+    assert columns['HEART_RATE'].dtype == numpy.float64
+    assert columns['HEART_RATE'].tolist() == [130.0, 120.0]
+
+
+@responses.activate
+def test_fleet_table_update():
+    other_device = copy.deepcopy(DEVICE_PAYLOAD)
+    other_device['dsn'] = 'd'
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE_PAYLOAD}, {'device': other_device}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': other_device}], status=200)
+    for dsn in ['c', 'd']:
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/%s/properties' % dsn,
+                  json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    for device in api.get_devices():
+        device.update()
+
+    table = api.get_fleet_table()
+    assert table.get_dsns() == ['c', 'd']
+    assert table.get_column('HEART_RATE').tolist() == [130.0, 130.0]
+    assert table.get_column('HEART_RATE', timestamps=True).tolist() == \
+        [api.get_devices()[0].get_property('HEART_RATE').timestamp()] * 2
+
+    # Vanished devices are removed
+    api.update_devices()
+    assert table.get_dsns() == ['d']
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+import responses
+import copy
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owlethealth import OwletHealthIndex
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'Online',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'APP_ACTIVE',
+            'base_type':'boolean',
+            'data_updated_at':'2018-12-30T09:50:00Z',
+            'key':42738119,
+            'display_name':'App Active',
+            'value':0
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def test_health_stale():
+    index = OwletHealthIndex()
+
+    for number in range(100):
+        index.touch('dsn%d' % number, 1000 + number)
+
+    assert index.oldest() == ('dsn0', 1000)
+    assert index.stale(60, now=1063) == ['dsn0', 'dsn1', 'dsn2']
+
+    index.touch('dsn1', 1100)
+    # Older data does not move a device back in time
+    index.touch('dsn2', 900)
+
+    assert index.get_last_data('dsn1') == 1100
+    assert index.stale(60, now=1063) == ['dsn0', 'dsn2']
+
+    index.remove('dsn0')
+    assert index.oldest() == ('dsn2', 1002)
+    assert index.stale(60, now=1063) == ['dsn2']
+    assert index.stale(60, now=1000) == []
+
+    # Back with the same data as before it was removed
+    index.remove('dsn2')
+    index.touch('dsn2', 1002)
+    assert index.stale(60, now=1063) == ['dsn2']
+
+
+def test_health_compaction():
+    index = OwletHealthIndex()
+
+    for timestamp in range(1000):
+        index.touch('c', timestamp)
+        index.touch('d', timestamp)
+
+    assert len(index._heap) <= 2 * 2 + 16 + 1
+    assert index.oldest() == ('c', 999)
+    assert index.stale(1, now=1001) == ['c', 'd']
+
+
+def test_health_status():
+    index = OwletHealthIndex()
+
+    index.set_status('c', 'Online')
+    index.set_status('d', 'Online')
+    index.set_status('e', 'Offline')
+
+    assert index.with_status('Online') == {'c', 'd'}
+    assert index.with_status('Offline') == {'e'}
+    assert index.with_status('Unknown') == set()
+
+    index.set_status('d', 'Offline')
+    assert index.get_status('d') == 'Offline'
+    assert index.with_status('Online') == {'c'}
+    assert index.with_status('Offline') == {'d', 'e'}
+
+    index.remove('e')
+    assert index.get_status('e') is None
+    assert index.with_status('Offline') == {'d'}
+
+    # Devices that never sent data are stale
+    assert index.stale(300, now=1000) == ['c', 'd']
+
+
+@responses.activate
+def test_health_api():
+    offline_device = copy.deepcopy(DEVICE)
+    offline_device['dsn'] = 'd'
+    offline_device['connection_status'] = 'Offline'
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE}, {'device': offline_device}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    index = api.get_health_index()
+
+    device = api.get_devices()[0]
+    assert index.with_status('Offline') == {'d'}
+
+    device.update()
+    # APP_ACTIVE does not count as data from the device
+    assert index.get_last_data('c') == 1546163003.0
+    assert index.oldest() == ('d', 0)
+
+    api.update_devices()
+    assert index.with_status('Offline') == set()
+    assert index.oldest() == ('c', 1546163003.0)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+import pytest
+from json.decoder import JSONDecodeError
+
+from owlet_api import owletjson
+
+
+@pytest.fixture
+def backend():
+    name = owletjson.get_backend()
+    yield
+    owletjson.set_backend(name)
+
+
+def test_default_backend():
+    assert owletjson.get_backend() in owletjson.BACKENDS
+
+
+@pytest.mark.parametrize('name', owletjson.BACKENDS)
+def test_backend_loads(backend, name):
+    try:
+        owletjson.set_backend(name)
+    except ImportError:
+        pytest.skip('%s not installed' % name)
+
+    assert owletjson.get_backend() == name
+    assert owletjson.loads(b'[{"property": {"value": 97}}]') == \
+        [{'property': {'value': 97}}]
+    assert owletjson.loads('{"value": "ä"}') == {'value': 'ä'}
+
+    for invalid in [b'INVALID', 'INVALID', b'\x8e\xff', b'']:
+        with pytest.raises(JSONDecodeError):
+            owletjson.loads(invalid)
+
+
+def test_backend_unknown(backend):
+    with pytest.raises(ImportError):
+        owletjson.set_backend('pickle')
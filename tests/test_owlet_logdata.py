@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+import pytest
+
+from owlet_api.owletstore import OwletStore
+from owlet_api.owletlogdata import OwletLogFile, write_records
+from owlet_api.owletlogdata import records_from_store, HEADER, RECORD
+
+
+def test_write_read(tmp_path):
+    path = str(tmp_path / 'log.bin')
+
+    count = write_records(path, [(1.0, 130, 97, 1), (2.0, None, '96', 0)])
+    assert count == 2
+
+    logfile = OwletLogFile(path)
+    assert len(logfile) == 2
+    assert logfile[0] == (1.0, 130, 97, 1)
+    assert logfile[-1] == (2.0, -1, 96, 0)
+    assert list(logfile) == [(1.0, 130, 97, 1), (2.0, -1, 96, 0)]
+
+    with pytest.raises(IndexError):
+        logfile[2]
+
+    logfile.close()
+
+    with open(path, 'rb') as logfile:
+        assert len(logfile.read()) == HEADER.size + 2 * RECORD.size
+
+
+def test_read_invalid(tmp_path):
+    path = str(tmp_path / 'log.bin')
+
+    with open(path, 'wb') as logfile:
+        logfile.write(b'NOTOWLETLOGFILE!')
+
+    with pytest.raises(ValueError) as info:
+        OwletLogFile(path)
+
+    assert 'Unsupported file format' in str(info.value)
+
+    with open(path, 'wb') as logfile:
+        logfile.write(b'OWLET')
+
+    with pytest.raises(ValueError) as info:
+        OwletLogFile(path)
+
+    assert 'File too short for header' in str(info.value)
+
+
+def test_records_from_store(tmp_path):
+    store = OwletStore(str(tmp_path / 'owlet.db'))
+    store.add_sample('c', 'HEART_RATE', 10.0, 130)
+    store.add_sample('c', 'OXYGEN_LEVEL', 10.0, 97)
+    store.add_sample('c', 'MOVEMENT', 12.0, 1)
+    store.add_sample('c', 'HEART_RATE', 14.0, 128)
+    store.add_sample('d', 'HEART_RATE', 14.0, 100)
+
+    assert list(records_from_store(store, 'c')) == [
+        (10.0, 130, 97, -1),
+        (12.0, 130, 97, 1),
+        (14.0, 128, 97, 1),
+    ]
+    assert list(records_from_store(store, 'c', start=11)) == [
+        (12.0, -1, -1, 1),
+        (14.0, 128, -1, 1),
+    ]
+    assert list(records_from_store(store, 'e')) == []
+
+    store.close()
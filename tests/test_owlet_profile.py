@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import io
+import responses
+from unittest.mock import patch
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletprofile import OwletProfiler, NULL_PHASE
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def test_profiler_percentiles():
+    profiler = OwletProfiler()
+
+    for number in range(1, 101):
+        profiler.add('http', number / 1000)
+
+    assert profiler.percentiles('http') == {50: 0.051, 90: 0.091, 99: 0.1}
+    assert profiler.percentiles('json') == {50: None, 90: None, 99: None}
+
+
+def test_profiler_samples():
+    profiler = OwletProfiler(samples=10)
+
+    for number in range(100):
+        profiler.add('parse', number)
+
+    # Percentiles cover recent samples, totals all of them
+    assert profiler.percentiles('parse', points=(0,)) == {0: 90}
+    assert profiler._totals['parse'] == [100, 4950]
+
+
+@patch('time.perf_counter')
+def test_profiler_phase(perf_counter_mock):
+    perf_counter_mock.side_effect = [10.0, 10.5]
+    profiler = OwletProfiler()
+
+    with profiler.phase('sleep'):
+        pass
+
+    assert profiler.percentiles('sleep', points=(50,)) == {50: 0.5}
+
+    stream = io.StringIO()
+    profiler.dump(stream)
+    assert stream.getvalue().splitlines()[1].split() == \
+        ['sleep', '1', '500.00', '500.00', '500.00', '0.50']
+
+
+@responses.activate
+def test_profile_api():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE_PAYLOAD}], status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    assert api.profile('http') is NULL_PHASE
+
+    api.set_profiler(OwletProfiler())
+    api.login()
+    api.get_devices()[0].update()
+
+    totals = api.get_profiler()._totals
+    # Login, devices and properties
+    assert totals['http'][0] == 3
+    assert totals['json'][0] == 2
+    assert totals['parse'][0] == 1
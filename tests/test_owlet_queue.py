@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import pytest
+import queue
+import threading
+
+from owlet_api.owletqueue import OwletChangeQueue
+
+
+def drain(changes):
+    items = []
+    while len(changes):
+        items.append(changes.get())
+    return items
+
+
+def test_queue_block():
+    changes = OwletChangeQueue(2)
+    changes.put('c', 1)
+    changes.put('c', 2)
+
+    with pytest.raises(queue.Full):
+        changes.put('d', 3, timeout=0.01)
+
+    # A consumer makes space for a blocked producer
+    producer = threading.Thread(target=changes.put, args=('d', 3))
+    producer.start()
+    assert changes.get() == ('c', 1)
+    producer.join(10)
+
+    assert drain(changes) == [('c', 2), ('d', 3)]
+    assert changes.dropped == 0
+
+
+def test_queue_drop_oldest():
+    changes = OwletChangeQueue(2, 'drop_oldest')
+    for number in range(5):
+        changes.put('c', number)
+
+    assert drain(changes) == [('c', 3), ('c', 4)]
+    assert changes.dropped == 3
+
+
+def test_queue_coalesce():
+    changes = OwletChangeQueue(2, 'coalesce')
+    changes.put('c', 1)
+    changes.put('d', 2)
+    changes.put('c', 3)
+
+    # Latest item per key, at the key's place in the queue
+    assert drain(changes) == [('c', 3), ('d', 2)]
+    assert changes.dropped == 1
+
+    changes.put('c', 4)
+    changes.put('d', 5)
+    changes.put('e', 6)
+    assert drain(changes) == [('d', 5), ('e', 6)]
+    assert changes.dropped == 2
+
+    with pytest.raises(ValueError):
+        OwletChangeQueue(2, 'ignore')
+
+
+def test_queue_close():
+    changes = OwletChangeQueue(1)
+    changes.put('c', 1)
+
+    with pytest.raises(queue.Empty):
+        OwletChangeQueue().get(timeout=0.01)
+
+    # A blocked producer gives up once nobody consumes anymore
+    producer = threading.Thread(target=changes.put, args=('c', 2))
+    producer.start()
+    changes.close()
+    producer.join(10)
+    assert not producer.is_alive()
+    assert changes.dropped == 1
+
+    assert changes.get() == ('c', 1)
+    assert changes.get() is None
+    assert changes.get(timeout=1) is None
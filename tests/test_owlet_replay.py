@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+import responses
+import pytest
+import requests
+import json
+from unittest.mock import patch
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletreplay import OwletRecorder, OwletReplay
+from owlet_api.owletexceptions import OwletTemporaryCommunicationException
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICES_PAYLOAD = [
+    {
+        'device': {
+            'product_name': 'a',
+            'model': 'b',
+            'dsn': 'c',
+            'oem_model': 'd',
+            'sw_version': 'e',
+            'template_id': 1,
+            'mac': 'g',
+            'unique_hardware_id': None,
+            'hwsig': 'h',
+            'lan_ip': 'i',
+            'connected_at': 'j',
+            'key': 1,
+            'lan_enabled': False,
+            'has_properties': True,
+            'product_class': None,
+            'connection_status': 'k',
+            'lat': '1.0',
+            'lng': '2.0',
+            'locality': 'l',
+            'device_type': 'm'
+        }
+    }
+]
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'OXYGEN_LEVEL',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738116,
+            'display_name':'Oxygen Level',
+            'value':97
+        }
+    }
+]
+
+
+@responses.activate
+def record(path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=DEVICES_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              body=requests.exceptions.ConnectionError('down'))
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              body=b'\x8e\xff', status=500)
+
+    recorder = OwletRecorder(path)
+    api = OwletAPI("test@test.de", "moped", session=recorder)
+    api.login()
+    device = api.get_devices()[0]
+    device.update()
+
+    with pytest.raises(OwletTemporaryCommunicationException):
+        device.update()
+
+    # No response
+    with pytest.raises(OwletTemporaryCommunicationException):
+        api.update_devices()
+
+    recorder.close()
+
+
+def test_record(tmp_path):
+    path = str(tmp_path / 'capture.jsonl')
+    record(path)
+
+    with open(path) as capture:
+        exchanges = [json.loads(line) for line in capture]
+
+    assert [exchange['status'] for exchange in exchanges] == \
+        [200, 200, 200, 500, None]
+    assert exchanges[1]['url'] == \
+        'https://ads-field.aylanetworks.com/apiv1/devices.json'
+    assert json.loads(exchanges[0]['text']) == LOGIN_PAYLOAD
+    assert exchanges[3]['body'] == 'jv8='
+
+
+def test_replay(tmp_path):
+    path = str(tmp_path / 'capture.jsonl')
+    record(path)
+
+    api = OwletAPI("test@test.de", "moped", session=OwletReplay(path))
+    api.login()
+    assert api.get_auth_token() == 'testtoken'
+
+    device = api.get_devices()[0]
+    device.update()
+    assert device.get_property('OXYGEN_LEVEL').value == 97
+
+    with pytest.raises(OwletTemporaryCommunicationException) as info:
+        device.update()
+
+    assert 'Server Request failed - status code' in str(info.value)
+
+    with pytest.raises(OwletTemporaryCommunicationException) as info:
+        api.update_devices()
+
+    assert 'Server request failed - no response' in str(info.value)
+
+    # The capture is exhausted
+    with pytest.raises(OwletTemporaryCommunicationException) as info:
+        device.update()
+
+    assert 'Server Request failed - no response' in str(info.value)
+
+
+@patch('time.sleep')
+def test_replay_speed(sleep_mock, tmp_path):
+    path = str(tmp_path / 'capture.jsonl')
+
+    with open(path, 'w') as capture:
+        for offset in [0, 10]:
+            capture.write(json.dumps({
+                'time': 1000.0 + offset,
+                'method': 'GET',
+                'url': 'http://de.mo/file',
+                'status': 200,
+                'text': 'hello'}) + '\n')
+
+    replay = OwletReplay(path, speed=10)
+
+    with patch('time.time', return_value=50.0):
+        assert replay.request('GET', 'http://de.mo/file').text == 'hello'
+        assert replay.request('GET', 'http://de.mo/file').status_code == 200
+
+    assert sleep_mock.call_args_list[0][0][0] == 0
+    assert sleep_mock.call_args_list[1][0][0] == 1.0
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+import pytest
+import responses
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletscheduler import OwletScheduler
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+# Timestamp of the properties
+DATA_TIME = 1546163003.0
+
+
+def device_attributes(oxygen_level):
+    return [
+        {
+            'property':{
+                'type':'Property',
+                'name':'OXYGEN_LEVEL',
+                'base_type':'integer',
+                'data_updated_at':'2018-12-30T09:43:23Z',
+                'key':42738121,
+                'display_name':'Oxygen Level',
+                'value':oxygen_level
+            }
+        },
+        {
+            'property':{
+                'type':'Property',
+                'name':'HEART_RATE',
+                'base_type':'integer',
+                'data_updated_at':'2018-12-30T09:43:23Z',
+                'key':42738120,
+                'display_name':'Heart Rate',
+                'value':130
+            }
+        }
+    ]
+
+
+def fleet(oxygen_levels):
+    """Get devices with oxygen_levels, DSNs c, d, ..."""
+    devices = []
+
+    for number, oxygen_level in enumerate(oxygen_levels):
+        device = dict(DEVICE_PAYLOAD)
+        device['dsn'] = chr(ord('c') + number)
+        devices.append({'device': device})
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/%s/properties' % device['dsn'],
+                  json=device_attributes(oxygen_level), status=200)
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=devices, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    for device in api.get_devices():
+        device.update()
+
+    return api.get_devices()
+
+
+@responses.activate
+def test_scheduler_priority():
+    critical, stable, no_reading = fleet([92, 98, 0])
+    scheduler = OwletScheduler()
+
+    assert scheduler.get_priority(critical, DATA_TIME + 100) == 'critical'
+    assert scheduler.get_priority(stable, DATA_TIME + 5) == 'normal'
+    assert scheduler.get_priority(no_reading, DATA_TIME + 5) == 'normal'
+
+    # No data for a while
+    assert scheduler.get_priority(stable, DATA_TIME + 100) == 'low'
+
+    scheduler.set_priority('d', 'high')
+    assert scheduler.get_priority(stable, DATA_TIME + 100) == 'high'
+    scheduler.set_priority('d', None)
+    assert scheduler.get_priority(stable, DATA_TIME + 5) == 'normal'
+
+    with pytest.raises(ValueError):
+        scheduler.set_priority('d', 'urgent')
+
+
+@responses.activate
+def test_scheduler_budget():
+    critical, stable, flagged = fleet([92, 98, 98])
+    now = DATA_TIME + 5
+
+    # Two requests at first, then one per second
+    scheduler = OwletScheduler(budget=1, burst=2)
+    scheduler.set_priority('e', 'high')
+
+    devices = [stable, flagged, critical]
+    assert scheduler.schedule(devices, now) == [critical, flagged]
+    assert scheduler.shed == {'critical': 0, 'high': 0, 'normal': 1, 'low': 0}
+
+    # The postponed device is polled as soon as there is budget
+    assert scheduler.schedule(devices, now + 1) == [stable]
+    assert scheduler.schedule(devices, now + 2) == []
+
+    assert scheduler.schedule(devices, now + 10) == [critical, flagged]
+    assert scheduler.schedule(devices, now + 11) == [stable]
+
+
+@responses.activate
+def test_scheduler_unlimited():
+    critical, stable, flagged = fleet([92, 98, 98])
+    now = DATA_TIME + 5
+
+    scheduler = OwletScheduler()
+    scheduler.set_priority('e', 'high')
+
+    devices = [stable, flagged, critical]
+    assert scheduler.schedule(devices, now) == [critical, flagged, stable]
+    assert scheduler.schedule(devices, now + 1) == []
+    assert scheduler.schedule(devices, now + 10) == [critical, flagged, stable]
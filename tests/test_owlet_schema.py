@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import copy
+import pytest
+import responses
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owletproperty import OwletProperty
+from owlet_api.owletschema import OwletSchema, OwletPropertyDefinition
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'APP_ACTIVE',
+            'base_type':'boolean',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738119,
+            'display_name':'App Active',
+            'value':0
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def test_schema_define():
+    schema = OwletSchema()
+
+    heart_rate = schema.define('HEART_RATE', 'Heart Rate', 'integer')
+    oxygen = schema.define('OXYGEN_LEVEL', 'Oxygen Level', 'integer')
+
+    assert heart_rate == OwletPropertyDefinition(0, 'HEART_RATE', 'Heart Rate', 'integer')
+    assert oxygen.index == 1
+    assert schema.define('HEART_RATE', 'Heart Rate', 'integer') is heart_rate
+    assert schema.get('HEART_RATE') is heart_rate
+    assert schema.get('MOVEMENT') is None
+    assert schema.get_by_index(1) is oxygen
+    assert schema.names() == ['HEART_RATE', 'OXYGEN_LEVEL']
+    assert len(schema) == 2
+
+    # Changed metadata keeps the index
+    renamed = schema.define('HEART_RATE', 'Pulse', 'integer')
+    assert renamed.index == 0 and renamed.display_name == 'Pulse'
+    assert len(schema) == 2
+
+
+def test_property_definition():
+    schema = OwletSchema()
+    attributes = copy.deepcopy(DEVICE_ATTRIBUTES[1]['property'])
+
+    myproperty = OwletProperty(attributes, schema)
+    assert myproperty.definition is schema.get('HEART_RATE')
+    assert myproperty.name == 'HEART_RATE'
+    assert myproperty.display_name == 'Heart Rate'
+    assert myproperty.base_type == 'integer'
+
+    # No per instance dictionary
+    with pytest.raises(AttributeError):
+        myproperty.unknown = 1
+
+    attributes['base_type'] = 'decimal'
+    attributes['value'] = '130.5'
+    myproperty.update(attributes)
+    assert myproperty.base_type == 'decimal'
+    assert myproperty.value == 130.5
+
+
+@responses.activate
+def test_schema_shared_by_devices():
+    other_device = copy.deepcopy(DEVICE_PAYLOAD)
+    other_device['dsn'] = 'd'
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE_PAYLOAD}, {'device': other_device}], status=200)
+    for dsn in ['c', 'd']:
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/%s/properties' % dsn,
+                  json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    first, second = api.get_devices()
+    first.update()
+    second.update()
+
+    assert api.get_schema().names() == ['APP_ACTIVE', 'HEART_RATE']
+    assert first.get_property('HEART_RATE').definition is \
+        second.get_property('HEART_RATE').definition
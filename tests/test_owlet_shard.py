@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import responses
+import copy
+import queue
+from unittest.mock import Mock, patch
+
+from owlet_api.owletshard import shard_of, poll_shard, OwletShardedPoller
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE = {
+    'product_name': 'a',
+    'model': 'b',
+    'dsn': 'c',
+    'oem_model': 'd',
+    'sw_version': 'e',
+    'template_id': 1,
+    'mac': 'g',
+    'unique_hardware_id': None,
+    'hwsig': 'h',
+    'lan_ip': 'i',
+    'connected_at': 'j',
+    'key': 1,
+    'lan_enabled': False,
+    'has_properties': True,
+    'product_class': None,
+    'connection_status': 'k',
+    'lat': '1.0',
+    'lng': '2.0',
+    'locality': 'l',
+    'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'APP_ACTIVE',
+            'base_type':'boolean',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738119,
+            'display_name':'App Active',
+            'value':0
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'HEART_RATE',
+            'base_type':'integer',
+            'data_updated_at':'null',
+            'key':42738120,
+            'display_name':'Heart Rate',
+            'value':130
+        }
+    }
+]
+
+
+def add_responses():
+    other_device = copy.deepcopy(DEVICE)
+    other_device['dsn'] = 'd'
+
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/devices.json',
+              json=[{'device': DEVICE}, {'device': other_device}], status=200)
+    for dsn in ['c', 'd']:
+        responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/%s/properties' % dsn,
+                  json=DEVICE_ATTRIBUTES, status=200)
+    responses.add(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+              json=[{'status': 201}], status=207)
+
+
+def test_shard_of():
+    assert shard_of('c', 2) == 1
+    assert shard_of('d', 2) == 0
+    assert shard_of('AC000W000000001', 7) == shard_of('AC000W000000001', 7)
+    assert 0 <= shard_of('AC000W000000001', 7) < 7
+
+
+@responses.activate
+def test_poll_shard():
+    add_responses()
+
+    records = queue.Queue()
+    stop = Mock()
+    # Login, one poll cycle, then stop
+    stop.is_set.side_effect = [False, False, True]
+
+    poll_shard([('test@test.de', 'moped')], 0, 2, records, stop)
+
+    assert records.get_nowait() == [
+        ('d', 'APP_ACTIVE', 1546163003.0, 0),
+        ('d', 'HEART_RATE', None, 130)]
+    assert records.empty()
+    stop.wait.assert_called_once()
+
+
+@responses.activate
+def test_poll_shard_reactivate_failed():
+    add_responses()
+    responses.replace(responses.POST, 'https://ads-field.aylanetworks.com/apiv1/batch_datapoints.json',
+                  status=500)
+
+    records = queue.Queue()
+    stop = Mock()
+    stop.is_set.side_effect = [False, False, True]
+
+    poll_shard([('test@test.de', 'moped')], 0, 2, records, stop)
+
+    # Changes are reported although the device was not reactivated
+    assert records.get_nowait()[0][0] == 'd'
+    assert responses.calls[-1].request.url.endswith('/batch_datapoints.json')
+
+
+@responses.activate
+def test_poll_shard_account():
+    add_responses()
+
+    records = queue.Queue()
+    stop = Mock()
+    stop.is_set.side_effect = [False, False, True]
+
+    # The account hashes to shard 0 of 2, so shard 1 has nothing to do
+    assert shard_of('test@test.de', 2) == 0
+    poll_shard([('test@test.de', 'moped')], 1, 2, records, stop,
+               partition='account')
+    assert records.empty()
+
+    stop.is_set.side_effect = [False, False, True]
+    poll_shard([('test@test.de', 'moped')], 0, 2, records, stop,
+               partition='account')
+    assert records.get_nowait()[0][0] == 'c'
+    assert records.get_nowait()[0][0] == 'd'
+
+
+@patch('multiprocessing.Process')
+def test_sharded_poller(process_mock):
+    poller = OwletShardedPoller([('test@test.de', 'moped')], shards=3)
+    poller.start()
+
+    assert process_mock.call_count == 3
+    assert process_mock.call_args[1]['args'][1:3] == (2, 3)
+
+    poller._records.put([('c', 'HEART_RATE', 1.0, 130),
+                         ('c', 'OXYGEN_LEVEL', 1.0, 97)])
+    assert list(poller.records(timeout=1)) == [
+        ('c', 'HEART_RATE', 1.0, 130), ('c', 'OXYGEN_LEVEL', 1.0, 97)]
+
+    process_mock.return_value.is_alive.return_value = False
+    poller.stop()
+    assert process_mock.return_value.join.call_count == 3
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+
+import responses
+import pytest
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owlet import Owlet
+from owlet_api.owletstore import OwletStore
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+DEVICE_PAYLOAD = {
+        'product_name': 'a',
+        'model': 'b',
+        'dsn': 'c',
+        'oem_model': 'd',
+        'sw_version': 'e',
+        'template_id': 1,
+        'mac': 'g',
+        'unique_hardware_id': None,
+        'hwsig': 'h',
+        'lan_ip': 'i',
+        'connected_at': 'j',
+        'key': 1,
+        'lan_enabled': False,
+        'has_properties': True,
+        'product_class': None,
+        'connection_status': 'k',
+        'lat': '1.0',
+        'lng': '2.0',
+        'locality': 'l',
+        'device_type': 'm'
+}
+
+DEVICE_ATTRIBUTES = [
+    {
+        'property':{
+            'type':'Property',
+            'name':'OXYGEN_LEVEL',
+            'base_type':'integer',
+            'data_updated_at':'2018-12-30T09:43:23Z',
+            'key':42738116,
+            'display_name':'Oxygen Level',
+            'value':97
+        }
+    },
+    {
+        'property':{
+            'type':'Property',
+            'name':'BABY_NAME',
+            'base_type':'string',
+            'data_updated_at':'null',
+            'key':42738165,
+            'display_name':'Baby\'s Name',
+            'value':'Little Baby'
+        }
+    }
+]
+
+
+def test_store_query(tmp_path):
+    store = OwletStore(str(tmp_path / 'owlet.db'))
+
+    store.add_sample('c', 'OXYGEN_LEVEL', 100.0, 97)
+    store.add_sample('c', 'OXYGEN_LEVEL', 110.0, 96)
+    store.add_sample('c', 'HEART_RATE', 110.0, 130)
+    store.add_sample('d', 'OXYGEN_LEVEL', 110.0, 80)
+
+    assert list(store.query('c', 'OXYGEN_LEVEL')) == \
+        [(100.0, 97), (110.0, 96)]
+    assert list(store.query('c', 'OXYGEN_LEVEL', start=105)) == \
+        [(110.0, 96)]
+    assert list(store.query('c', 'OXYGEN_LEVEL', end=105)) == \
+        [(100.0, 97)]
+    assert list(store.last('d', 'OXYGEN_LEVEL', 5, now=112)) == \
+        [(110.0, 80)]
+    assert list(store.query('e', 'OXYGEN_LEVEL')) == []
+
+    store.close()
+
+
+def test_store_persistent(tmp_path):
+    path = str(tmp_path / 'owlet.db')
+    store = OwletStore(path)
+    store.add_sample('c', 'BABY_NAME', 100.0, 'Little Baby')
+    store.close()
+
+    store = OwletStore(path)
+    assert list(store.query('c', 'BABY_NAME')) == [(100.0, 'Little Baby')]
+    store.close()
+
+
+def test_store_batch(tmp_path):
+    store = OwletStore(str(tmp_path / 'owlet.db'), batch_size=2)
+
+    store.add_sample('c', 'OXYGEN_LEVEL', 100.0, 97)
+    assert len(store._pending) == 1
+
+    store.add_sample('c', 'OXYGEN_LEVEL', 101.0, 97)
+    assert len(store._pending) == 0
+
+    # Duplicate samples are ignored
+    store.add_sample('c', 'OXYGEN_LEVEL', 101.0, 97)
+    assert len(list(store.query('c', 'OXYGEN_LEVEL'))) == 2
+
+    store.close()
+
+
+def test_store_purge(tmp_path):
+    store = OwletStore(str(tmp_path / 'owlet.db'))
+
+    for timestamp in range(10):
+        store.add_sample('c', 'OXYGEN_LEVEL', timestamp, 90 + timestamp)
+
+    assert store.purge(5) == 5
+    assert [row[0] for row in store.query('c', 'OXYGEN_LEVEL')] == \
+        [5, 6, 7, 8, 9]
+
+    store.close()
+
+
+def test_store_downsample(tmp_path):
+    store = OwletStore(str(tmp_path / 'owlet.db'))
+
+    for timestamp in range(10):
+        store.add_sample('c', 'OXYGEN_LEVEL', timestamp, 90 + timestamp)
+        store.add_sample('d', 'OXYGEN_LEVEL', timestamp, 80 + timestamp)
+
+    assert store.downsample(6, 3) == 8
+    assert list(store.query('c', 'OXYGEN_LEVEL')) == \
+        [(0, 90), (3, 93), (6, 96), (7, 97), (8, 98), (9, 99)]
+    assert [row[0] for row in store.query('d', 'OXYGEN_LEVEL')] == \
+        [0, 3, 6, 7, 8, 9]
+
+    store.close()
+
+
+@responses.activate
+def test_store_record(tmp_path):
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+    responses.add(responses.GET, 'https://ads-field.aylanetworks.com/apiv1/dsns/c/properties',
+              json=DEVICE_ATTRIBUTES, status=200)
+
+    api = OwletAPI("test@test.de", "moped")
+    api.login()
+    device = Owlet(api, DEVICE_PAYLOAD)
+    device.update()
+
+    store = OwletStore(str(tmp_path / 'owlet.db'))
+    store.record(device)
+    store.record(device)
+
+    assert list(store.query('c', 'OXYGEN_LEVEL')) == [(1546163003.0, 97)]
+    # Properties without timestamp are not recorded
+    assert list(store.query('c', 'BABY_NAME')) == []
+
+    store.close()
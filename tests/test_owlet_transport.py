@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import pytest
+import requests
+import responses
+
+from owlet_api.owletapi import OwletAPI
+from owlet_api.owlettransport import create_session, accept_encoding, transfer_size
+
+LOGIN_PAYLOAD = {
+    'access_token': 'testtoken',
+    'expires_in': 86400
+}
+
+
+def test_create_session():
+    assert isinstance(create_session(), requests.Session)
+    assert isinstance(create_session('http1'), requests.Session)
+
+    with pytest.raises(ValueError):
+        create_session('gopher')
+
+
+@responses.activate
+def test_transport_http1():
+    responses.add(responses.POST, 'https://user-field.aylanetworks.com/users/sign_in.json',
+              json=LOGIN_PAYLOAD, status=200)
+
+    api = OwletAPI("test@test.de", "moped", transport='http1')
+    api.login()
+
+    assert api.get_auth_token() == 'testtoken'
+
+
+def test_transport_unknown():
+    with pytest.raises(ValueError):
+        OwletAPI("test@test.de", "moped", transport='gopher')
+
+
+def test_transport_http2():
+    httpx = pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+
+    def handler(request):
+        if request.url.path == '/users/sign_in.json':
+            return httpx.Response(200, json=LOGIN_PAYLOAD)
+        raise httpx.ReadTimeout('timed out', request=request)
+
+    api = OwletAPI("test@test.de", "moped", transport='http2')
+    api._session._client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    api.login()
+    assert api.get_auth_token() == 'testtoken'
+
+    # httpx errors surface as requests errors
+    with pytest.raises(requests.exceptions.Timeout):
+        api.request('devices', 'GET', api.base_properties_url + 'devices.json')
+    assert api.get_metrics()['timeouts'] == 1
+
+
+def test_transfer_size():
+    from owlet_api.owletreplay import OwletReplayResponse
+
+    response = OwletReplayResponse({'url': 'x', 'status': 200, 'text': 'abc'})
+    assert transfer_size(response) == 3
+
+    response.headers = {'Content-Length': '2'}
+    assert transfer_size(response) == 2
+
+
+def test_accept_encoding():
+    assert accept_encoding().startswith('gzip, deflate')